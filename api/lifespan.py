@@ -19,6 +19,7 @@ from common.graph.config import client_config
 from common.services.knowledge_base import KnowledgeBaseService
 from common.utils.logger import setup_logger
 from rag.agent import create_rag_agent
+from rag.cyphers.chunk import expanded_chunk_retrieval
 from rag.types.agent import RAGAgent
 
 SQL_LITE_DB = os.getenv("SQL_LITE_DB", "database.db")
@@ -80,10 +81,7 @@ async def init_vector_store() -> VectorStoreService:
             name=VectorStoreName.lexical,
             text_property="text",
             index_name="vector_index",
-            retrieval_query=(
-                "RETURN node.text AS text, score, "
-                "node {.*, text: Null, embedding:Null} as metadata"
-            ),
+            retrieval_query=expanded_chunk_retrieval,
         ),
     ]
     await vector_store_service.initialize(configs)
@@ -39,6 +39,7 @@ async def chat(
             llm=llm,
             lexical_vector_store=lexical_vector_store,
             commuunity_vector_store=community_vector_store,
+            knowledge_base_id=payload.knowledge_base_id,
         ),
         config={"configurable": {"thread_id": thread_id}},
     )
@@ -1,4 +1,7 @@
+import asyncio
+import os
 import shutil
+import tempfile
 from pathlib import Path
 from typing import Annotated
 
@@ -14,14 +17,22 @@ from api.schema.knowledge_base import IngestionRequest
 from api.utils.files import extract_zip
 from common.schema.knowledge_base import KnowledgeBase
 from common.services.knowledge_base import KnowledgeBaseService
+from ingestion.cache import ExtractionCache
 from ingestion.ingestors.lexical_graph import LexicalGraphIngestor
 from ingestion.ingestors.property_graph import PropertyGraphIngestor
 from ingestion.pipeline import Pipeline
-from ingestion.readers.markdown import MarkdownReader
+from ingestion.readers.markdown import load_markdown_files
 
 API_ROOT = Path(__file__).resolve().parent.parent
 TEMP_ROOT = API_ROOT / "temp"
 TEMP_ROOT.mkdir(exist_ok=True)
+# Kept out of the source tree; set EXTRACTION_CACHE_DIR to persist it elsewhere
+EXTRACTION_CACHE_ROOT = Path(
+    os.getenv(
+        "EXTRACTION_CACHE_DIR",
+        Path(tempfile.gettempdir()) / "graph-rag" / "extraction",
+    )
+)
 
 router = APIRouter()
 
@@ -47,8 +58,6 @@ async def ingest(
         p for p in extract_dir.rglob("*") if p.is_file() and p.suffix in {".md", ".txt"}
     ]
 
-    files = [MarkdownReader(path).load() for path in file_paths]
-
     knowledge_base = KnowledgeBase(**payload.model_dump(exclude={"files"}))
 
     lexical_graph_ingestor = LexicalGraphIngestor(
@@ -59,6 +68,7 @@ async def ingest(
         llm=llm,
         vector_store=property_vector_store,
         knowledge_base_service=knowledge_base_service,
+        extraction_cache=ExtractionCache(EXTRACTION_CACHE_ROOT),
     )
 
     pipeline = Pipeline(
@@ -67,8 +77,15 @@ async def ingest(
         ingestors=[lexical_graph_ingestor, property_graph_ingestor],
     )
 
-    background_tasks.add_task(pipeline.run, files)
+    async def ingest_files():
+        # Runs on the server's event loop, the one the shared llm's async
+        # client is bound to. Files are read a few at a time ahead of the
+        # pipeline, so the extracted directory is only removed once ingestion
+        # is done
+        try:
+            await pipeline.arun(load_markdown_files(file_paths))
+        finally:
+            await asyncio.to_thread(shutil.rmtree, temp_dir)
 
-    # clean up
-    shutil.rmtree(temp_dir)
+    background_tasks.add_task(ingest_files)
     return
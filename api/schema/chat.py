@@ -5,6 +5,9 @@ from typing import Any
 class ChatRequest(BaseModel):
     thread_id: str | None = Field(None, description="Conversation thread id")
     query: str = Field(..., description="User input message")
+    knowledge_base_id: str | None = Field(
+        None, description="Only retrieve from this knowledge base"
+    )
 
 
 class ChatResponse(BaseModel):
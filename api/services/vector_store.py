@@ -1,9 +1,10 @@
 from fastapi.exceptions import HTTPException
+from langchain_neo4j import Neo4jGraph
 from langchain_neo4j.vectorstores.neo4j_vector import Neo4jVector
 
 from api.schema.vector_store import VectorStoreConfig
 from common.embedding import get_embedding
-from common.graph.config import neo4j_config
+from common.graph.config import driver_config, neo4j_config
 
 
 class VectorStoreService:
@@ -11,15 +12,30 @@ class VectorStoreService:
 
     def __init__(self):
         self._stores: dict[str, Neo4jVector] = {}
+        self._graph: Neo4jGraph | None = None
 
     async def initialize(self, configs: list[VectorStoreConfig]) -> None:
         """Initialize vector stores from configurations."""
         for config in configs:
             self._stores[config.name] = self._build_store(config)
 
+    def _get_graph(self) -> Neo4jGraph:
+        """Driver shared by every vector store, so they draw from one pool."""
+        if self._graph is None:
+            config = neo4j_config()
+            self._graph = Neo4jGraph(
+                url=config["url"],
+                username=config["username"],
+                password=config["password"],
+                refresh_schema=False,
+                driver_config=driver_config(),
+            )
+        return self._graph
+
     def _build_store(self, config: VectorStoreConfig) -> Neo4jVector:
         kwargs = {
             "embedding": get_embedding(),
+            "graph": self._get_graph(),
             "text_node_property": config.text_property,
             "embedding_node_property": "embedding",
             "index_name": config.index_name,
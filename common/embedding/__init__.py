@@ -3,14 +3,81 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
 
 from dotenv import load_dotenv
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from pydantic import PrivateAttr
 
 load_dotenv()
 
 
+class QueryCachedEmbeddings(GoogleGenerativeAIEmbeddings):
+    """Gemini embeddings that remember recent query embeddings.
+
+    Every vector search embeds its query text, and the Gemini API has no
+    cheaper single-text endpoint, so repeated queries are served from memory.
+    """
+
+    query_cache_size: int = 1024
+    _query_cache: OrderedDict[str, list[float]] = PrivateAttr(
+        default_factory=OrderedDict
+    )
+    _query_cache_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _cached(self, text: str) -> list[float] | None:
+        with self._query_cache_lock:
+            vector = self._query_cache.get(text)
+            if vector is not None:
+                self._query_cache.move_to_end(text)
+            return vector
+
+    def _remember(self, text: str, vector: list[float]) -> None:
+        with self._query_cache_lock:
+            self._query_cache[text] = vector
+            self._query_cache.move_to_end(text)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+
+    def embed_query(self, text: str, **kwargs: Any) -> list[float]:
+        """Embed a query, reusing the vector of an identical recent query.
+
+        Args:
+            text: The query text.
+            **kwargs: Per-call options; calls passing any bypass the cache.
+
+        Returns:
+            list[float]: The query embedding.
+        """
+        if kwargs:
+            return super().embed_query(text, **kwargs)
+        vector = self._cached(text)
+        if vector is None:
+            vector = super().embed_query(text)
+            self._remember(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str, **kwargs: Any) -> list[float]:
+        """Async version of embed_query.
+
+        Args:
+            text: The query text.
+            **kwargs: Per-call options; calls passing any bypass the cache.
+
+        Returns:
+            list[float]: The query embedding.
+        """
+        if kwargs:
+            return await super().aembed_query(text, **kwargs)
+        vector = self._cached(text)
+        if vector is None:
+            vector = await super().aembed_query(text)
+            self._remember(text, vector)
+        return vector
+
+
 class EmbeddingService:
     """Singleton service for managing embedding model instance across the application."""
 
@@ -29,7 +96,7 @@ class EmbeddingService:
             GoogleGenerativeAIEmbeddings: The singleton embedding model instance.
         """
         if self._embedding is None:
-            self._embedding = GoogleGenerativeAIEmbeddings(
+            self._embedding = QueryCachedEmbeddings(
                 model=os.getenv("EMBEDDING_MODEL", "gemini-embedding-001"),
                 output_dimensionality=int(os.getenv("EMBEDDING_DIMENSIONALITY", "768")),
             )
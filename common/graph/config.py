@@ -1,3 +1,5 @@
+import os
+
 from common.utils.environment import require_env
 
 
@@ -17,3 +19,12 @@ def client_config():
         password=require_env("NEO4J_PASSWORD"),
         database=require_env("NEO4J_DATABASE"),
     )
+
+
+def driver_config():
+    return dict(
+        max_connection_pool_size=int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", 50)),
+        connection_acquisition_timeout=float(
+            os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", 60)
+        ),
+    )
@@ -11,6 +11,20 @@ from langchain_openai import ChatOpenAI
 load_dotenv()
 
 
+def llm_client_config() -> dict:
+    """Timeout and retry settings for ChatOpenAI.
+
+    langchain-openai already shares one pooled keep-alive HTTP client per
+    base URL and timeout, so concurrent requests reuse open connections.
+    Rate limit and server errors are retried by the OpenAI client with
+    exponential backoff and jitter, honouring Retry-After.
+    """
+    return dict(
+        timeout=float(os.getenv("LLM_TIMEOUT", 60)),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", 5)),
+    )
+
+
 class LLMService:
     """Singleton service for managing LLM instance across the application."""
 
@@ -34,6 +48,7 @@ class LLMService:
                 base_url=os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1"),
                 temperature=float(os.getenv("LLM_TEMPERATURE", "0.7")),
                 reasoning_effort="medium",
+                **llm_client_config(),
             )
         return self._llm
 
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from pydantic import BaseModel, ValidationError
+
+from ingestion.schema.extractor import EntityRelationships
+
+
+class ExtractionCache:
+    """On-disk cache of LLM extractions keyed by the exact request content."""
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_entries: int | None = 10_000,
+        max_age_seconds: float | None = 30 * 24 * 3600.0,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Entries unused for max_age_seconds expire; past max_entries the
+        # least recently used ones are evicted. None disables either limit.
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._entry_count = self._prune()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode()
+            # Length prefix keeps ("ab", "c") and ("a", "bc") apart
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _expired(self, mtime: float, now: float) -> bool:
+        return self.max_age_seconds is not None and now - mtime > self.max_age_seconds
+
+    def _prune(self) -> int:
+        now = time.time()
+        entries: list[tuple[float, Path]] = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if self._expired(mtime, now):
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((mtime, path))
+        if self.max_entries is not None and len(entries) > self.max_entries:
+            # Trimmed to 90% of the limit so the next put doesn't prune again
+            entries.sort()
+            excess = len(entries) - int(self.max_entries * 0.9)
+            for _, path in entries[:excess]:
+                path.unlink(missing_ok=True)
+            entries = entries[excess:]
+        logging.debug("Extraction cache holds %s entries", len(entries))
+        return len(entries)
+
+    def get(
+        self, key: str, schema: type[BaseModel] = EntityRelationships
+    ) -> BaseModel | None:
+        path = self._path(key)
+        try:
+            if self._expired(path.stat().st_mtime, time.time()):
+                path.unlink(missing_ok=True)
+                return None
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            extraction = schema.model_validate_json(data)
+        except ValidationError as e:
+            logging.warning("Evicting invalid extraction cache entry %s: %s", key, e)
+            path.unlink(missing_ok=True)
+            return None
+        # The modification time doubles as the last use for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return extraction
+
+    def put(self, key: str, extraction: BaseModel):
+        path = self._path(key)
+        # Write to a temp file first so a crash never leaves a partial entry
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        is_new = not path.exists()
+        tmp_path.write_text(extraction.model_dump_json())
+        tmp_path.replace(path)
+        if is_new and self.max_entries is not None:
+            with self._lock:
+                self._entry_count += 1
+                if self._entry_count > self.max_entries:
+                    self._entry_count = self._prune()
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 
 from langchain_core.documents import Document
@@ -20,3 +21,11 @@ class BaseIngestor(ABC):
         documents: list[Document],
     ):
         pass
+
+    async def aingest(
+        self,
+        knowledge_base: KnowledgeBase,
+        file_metadata: FileMetadata,
+        documents: list[Document],
+    ):
+        await asyncio.to_thread(self.ingest, knowledge_base, file_metadata, documents)
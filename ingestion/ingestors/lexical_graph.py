@@ -1,5 +1,6 @@
 import logging
 
+import numpy as np
 from langchain_core.documents import Document
 from langchain_neo4j.vectorstores.neo4j_vector import Neo4jVector
 
@@ -7,6 +8,8 @@ from common.schema.knowledge_base import KnowledgeBase
 from ingestion.ingestors.base import BaseIngestor
 from ingestion.schema.file import FileMetadata
 
+_SIMILARITY_BLOCK_SIZE = 1024
+
 
 class LexicalGraphIngestor(BaseIngestor):
 
@@ -14,15 +17,36 @@ class LexicalGraphIngestor(BaseIngestor):
         self,
         vector_store: Neo4jVector,
         lexical_threshold: float = 0.75,
+        lexical_top_k: int = 2,
     ):
         logging.debug("Initializing LexicalGraphIngestor")
         self.knowledge_base: KnowledgeBase | None = None
         self.vector_store = vector_store
         self.lexical_threshold = lexical_threshold
-        logging.debug(f"Lexical threshold set to: {self.lexical_threshold}")
+        # Most similar chunks considered per chunk
+        self.lexical_top_k = lexical_top_k
+        logging.debug("Lexical threshold set to: %s", self.lexical_threshold)
 
         self.vector_store.create_new_index()
         logging.debug("Vector store index created")
+        self._create_constraints()
+
+    def _create_constraints(self):
+        logging.debug("Ensuring lexical graph constraints")
+        for statement in (
+            "CREATE CONSTRAINT chunk_id IF NOT EXISTS "
+            "FOR (c:Chunk) REQUIRE c.id IS UNIQUE",
+            "CREATE CONSTRAINT file_id IF NOT EXISTS "
+            "FOR (f:File) REQUIRE f.id IS UNIQUE",
+            "CREATE CONSTRAINT knowledge_base_id IF NOT EXISTS "
+            "FOR (kb:KnowledgeBase) REQUIRE kb.id IS UNIQUE",
+            "CREATE INDEX chunk_source_id IF NOT EXISTS "
+            "FOR (c:Chunk) ON (c.source_id)",
+            # Retrieval scoped to a knowledge base filters chunks on it
+            "CREATE INDEX chunk_knowledge_base_id IF NOT EXISTS "
+            "FOR (c:Chunk) ON (c.knowledge_base_id)",
+        ):
+            self.vector_store.query(statement)
 
     def ingest(
         self,
@@ -30,24 +54,29 @@ class LexicalGraphIngestor(BaseIngestor):
         file_metadata: FileMetadata,
         documents: list[Document],
     ):
-        logging.info(f"Ingesting Lexical Graph File {file_metadata['name']}")
+        logging.info("Ingesting Lexical Graph File %s", file_metadata["name"])
         if not self.knowledge_base:
             self.knowledge_base = knowledge_base
 
         logging.debug(
-            f"Processing {len(documents)} documents for file: {file_metadata['name']}"
+            "Processing %s documents for file: %s",
+            len(documents),
+            file_metadata["name"],
         )
 
         logging.debug("Adding knowledge_base_id to document metadata")
         for idx, document in enumerate(documents):
             document.metadata["knowledge_base_id"] = knowledge_base.id
             logging.debug(
-                f"Updated metadata for document {idx + 1}/{len(documents)}: {document.id}"
+                "Updated metadata for document %s/%s: %s",
+                idx + 1,
+                len(documents),
+                document.id,
             )
 
         logging.debug("Building vector store with documents")
         document_ids = self._build_vectorstore(documents)
-        logging.debug(f"Vector store built with {len(document_ids)} documents")
+        logging.debug("Vector store built with %s documents", len(document_ids))
 
         logging.debug("Creating file node")
         self._create_file_node(knowledge_base, file_metadata)
@@ -57,13 +86,13 @@ class LexicalGraphIngestor(BaseIngestor):
         self._build_lexical_graph(document_ids)
         logging.debug("Lexical graph built")
 
-        logging.info(f"Generated Lexical Graph for File {file_metadata['name']}")
+        logging.info("Generated Lexical Graph for File %s", file_metadata["name"])
 
     def _build_vectorstore(self, documents: list[Document]) -> list[str]:
-        logging.debug(f"Adding {len(documents)} documents to vector store")
+        logging.debug("Adding %s documents to vector store", len(documents))
         document_ids = self.vector_store.add_documents(documents)
         logging.debug(
-            f"Successfully added {len(document_ids)} documents to vector store"
+            "Successfully added %s documents to vector store", len(document_ids)
         )
         return document_ids
 
@@ -71,7 +100,7 @@ class LexicalGraphIngestor(BaseIngestor):
         self, knowledge_base: KnowledgeBase, file_metadata: FileMetadata
     ):
         logging.debug(
-            f"Creating file node: {file_metadata['id']} ({file_metadata['name']})"
+            "Creating file node: %s (%s)", file_metadata["id"], file_metadata["name"]
         )
         try:
             result = self.vector_store.query(
@@ -101,125 +130,129 @@ class LexicalGraphIngestor(BaseIngestor):
                     "knowledge_base_id": knowledge_base.id,
                 },
             )
-            logging.debug(f"File node created successfully: {file_metadata['id']}")
+            logging.debug("File node created successfully: %s", file_metadata["id"])
         except Exception as e:
             logging.error(
-                f"Failed to create file node for {file_metadata['id']}: {str(e)}"
+                "Failed to create file node for %s: %s", file_metadata["id"], e
             )
             raise
 
     def _build_lexical_graph(self, document_ids: list[str]):
-        logging.debug(f"Building lexical graph for {len(document_ids)} documents")
+        logging.debug("Building lexical graph for %s documents", len(document_ids))
 
         logging.debug("Retrieving document embeddings")
         documentid_embeddings = self._get_documents_embedding(document_ids)
         logging.debug(
-            f"Retrieved embeddings for {len(documentid_embeddings)} documents"
+            "Retrieved embeddings for %s documents", len(documentid_embeddings)
         )
 
         logging.debug("Computing lexical edges")
         edges = self._get_lexical_edges(documentid_embeddings)
         logging.debug(
-            f"Found {len(edges)} similar document pairs above threshold ({self.lexical_threshold})"
+            "Found %s similar document pairs above threshold (%s)",
+            len(edges),
+            self.lexical_threshold,
         )
 
-        logging.debug(f"Connecting {len(edges)} similar chunks")
+        logging.debug("Connecting %s similar chunks", len(edges))
         self._connect_similar_chunks(edges)
         logging.debug("Lexical graph construction complete")
 
     def _get_documents_embedding(self, document_ids: list[str]) -> dict[str, list]:
-        logging.debug(f"Fetching embeddings for {len(document_ids)} documents")
+        logging.debug("Fetching embeddings for %s documents", len(document_ids))
         embeddings_map: dict[str, list] = {}
         try:
             chunks = self.vector_store.query(
                 "MATCH (c:Chunk) WHERE c.id in $ids RETURN collect(c {.id, .embedding}) as chunks",
                 params={"ids": document_ids},
             )[0]["chunks"]
-            logging.debug(f"Retrieved {len(chunks)} chunks from database")
+            logging.debug("Retrieved %s chunks from database", len(chunks))
 
             for idx, chunk in enumerate(chunks):
                 vector = chunk["embedding"]
                 doc_id = chunk["id"]
                 embeddings_map[doc_id] = vector
-                logging.debug(f"Processed embedding {idx + 1}/{len(chunks)}: {doc_id}")
+                logging.debug(
+                    "Processed embedding %s/%s: %s", idx + 1, len(chunks), doc_id
+                )
 
             logging.debug(
-                f"Successfully created embeddings map with {len(embeddings_map)} entries"
+                "Successfully created embeddings map with %s entries",
+                len(embeddings_map),
             )
         except Exception as e:
-            logging.error(f"Failed to fetch embeddings: {str(e)}")
+            logging.error("Failed to fetch embeddings: %s", e)
             raise
         return embeddings_map
 
     def _get_lexical_edges(
         self, id_embedding_map: dict[str, list]
     ) -> list[tuple[str, str, float]]:
-        logging.debug(f"Computing lexical edges for {len(id_embedding_map)} documents")
+        logging.debug("Computing lexical edges for %s documents", len(id_embedding_map))
         edges: list[tuple[str, str, float]] = []
+        if len(id_embedding_map) < 2:
+            return edges
 
-        for idx, (doc_id, embedding) in enumerate(id_embedding_map.items()):
-            logging.debug(
-                f"Searching for similar documents {idx + 1}/{len(id_embedding_map)}: {doc_id}"
-            )
-            similarity_search = self.vector_store.similarity_search_with_score_by_vector(
-                embedding,
-                3,
-                filter={"knowledge_base_id": self.knowledge_base.id},
-                query="",  # query is added to avoid internal error, not actually used
-            )
-            logging.debug(
-                f"Found {len(similarity_search)} potential matches for {doc_id}"
-            )
+        doc_ids = list(id_embedding_map)
+        embeddings = np.asarray(list(id_embedding_map.values()), dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.maximum(norms, np.finfo(np.float32).tiny)
+        top_k = min(self.lexical_top_k, len(doc_ids) - 1)
 
-            matches_above_threshold = 0
-            for similar_document, score in similarity_search:
-                similar_doc_id = similar_document.metadata["id"]
-                if doc_id == similar_doc_id:
-                    logging.debug(f"Skipping self-match: {doc_id}")
-                    continue
-                if score > self.lexical_threshold:
-                    logging.debug(
-                        f"Match above threshold: {doc_id} -> {similar_doc_id} (score: {score:.4f})"
-                    )
-                    edges.append((doc_id, similar_doc_id, score))
-                    matches_above_threshold += 1
-                else:
-                    logging.debug(
-                        f"Match below threshold: {doc_id} -> {similar_doc_id} (score: {score:.4f})"
-                    )
+        # Rows are scored in blocks so memory stays at block x N instead of N x N
+        for start in range(0, len(doc_ids), _SIMILARITY_BLOCK_SIZE):
+            block = embeddings[start : start + _SIMILARITY_BLOCK_SIZE]
+            # Same scale as the Neo4j cosine vector index, (1 + cos) / 2, so
+            # lexical_threshold keeps its meaning
+            scores = (1 + block @ embeddings.T) / 2
+            rows = np.arange(len(block))
+            scores[rows, rows + start] = -np.inf
 
-            logging.debug(
-                f"Document {doc_id}: {matches_above_threshold} matches above threshold"
-            )
+            above = scores > self.lexical_threshold
+            counts = np.count_nonzero(above, axis=1)
+            # Rows with at most top_k matches keep all of them without ranking;
+            # only the remaining rows go through argpartition
+            rows, cols = np.nonzero(above & (counts <= top_k)[:, None])
+            dense_rows = np.flatnonzero(counts > top_k)
+            if dense_rows.size:
+                neighbours = np.argpartition(-scores[dense_rows], top_k - 1, axis=1)[
+                    :, :top_k
+                ]
+                rows = np.concatenate([rows, np.repeat(dense_rows, top_k)])
+                cols = np.concatenate([cols, neighbours.ravel()])
+
+            for row, col, score in zip(
+                rows.tolist(), cols.tolist(), scores[rows, cols].tolist()
+            ):
+                edges.append((doc_ids[start + row], doc_ids[col], score))
 
-        logging.debug(f"Total lexical edges computed: {len(edges)}")
+        logging.debug("Total lexical edges computed: %s", len(edges))
         return edges
 
     def _connect_similar_chunks(self, edges: list[tuple[str, str, float]]):
-        logging.debug(f"Connecting {len(edges)} similar chunk pairs")
+        logging.debug("Connecting %s similar chunk pairs", len(edges))
+        if not edges:
+            return
 
-        for idx, (_from, to, score) in enumerate(edges):
-            logging.debug(
-                f"Creating SIMILAR relationship {idx + 1}/{len(edges)}: {_from} -> {to} (score: {score:.4f})"
+        try:
+            self.vector_store.query(
+                """
+                UNWIND $edges AS edge
+                MATCH (from:Chunk {id: edge.from})
+                MATCH (to:Chunk {id: edge.to})
+                WHERE from.source_id = to.source_id
+                MERGE (from)-[r:SIMILAR]->(to)
+                ON CREATE SET r.score = edge.score
+                """,
+                params={
+                    "edges": [
+                        {"from": _from, "to": to, "score": score}
+                        for _from, to, score in edges
+                    ]
+                },
             )
-            try:
-                self.vector_store.query(
-                    """
-                    MATCH (from:Chunk {id: $from})
-                    MATCH (to:Chunk {id: $to})
-                    WHERE from.source_id = to.source_id
-                    MERGE (from)-[r:SIMILAR]->(to)
-                    ON CREATE SET r.score = $score
-                    """,
-                    params={"from": _from, "to": to, "score": score},
-                )
-                logging.debug(
-                    f"Successfully created SIMILAR relationship: {_from} -> {to}"
-                )
-            except Exception as e:
-                logging.error(
-                    f"Failed to create SIMILAR relationship {_from} -> {to}: {str(e)}"
-                )
-                raise
+        except Exception as e:
+            logging.error("Failed to create SIMILAR relationships: %s", e)
+            raise
 
-        logging.debug(f"All {len(edges)} SIMILAR relationships created successfully")
+        logging.debug("All %s SIMILAR relationships created successfully", len(edges))
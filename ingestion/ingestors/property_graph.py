@@ -1,25 +1,214 @@
-import json
+import asyncio
+import hashlib
 import logging
-import uuid
-from copy import deepcopy
+import operator
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import batched
 
-from langchain.messages import HumanMessage, SystemMessage
+import orjson
+from langchain.messages import (
+    AIMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
 from langchain_core.documents import Document
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_neo4j.vectorstores.neo4j_vector import Neo4jVector
+from pydantic import BaseModel, ValidationError
 
 from common.schema.knowledge_base import KnowledgeBase, Ontology
 from common.services.knowledge_base import KnowledgeBaseService
+from ingestion.cache import ExtractionCache
 from ingestion.ingestors.base import BaseIngestor
 from ingestion.prompts.property_graph import (
     COMMUNITY_SUMMARIZATION_SYSTEM_PROMPT,
+    EXISTING_ENTITIES_PROMPT,
     EXTRACTION_SYSTEM_PROMPT,
     ONTOLOGY_SYSTEM_PROMPT,
 )
-from ingestion.schema.extractor import Entity, EntityRelationships, Triplet
+from ingestion.schema.extractor import (
+    BatchEntityRelationships,
+    DocumentEntityRelationships,
+    Entity,
+    EntityRelationships,
+    Triplet,
+)
 from ingestion.schema.file import FileMetadata
 
+_TOKEN_PATTERN = re.compile(r"\w{3,}")
+# Share of all entities above which a token is ignored when picking context
+_COMMON_TOKEN_RATIO = 0.1
+_CODE_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$")
+# Shared by every ingestor: the API builds a new one per upload, and Leiden
+# writes community_id on every projected node, including those of other files
+_COMMUNITY_LOCK = threading.Lock()
+
+
+def _tokenize(text: str) -> set[str]:
+    return set(_TOKEN_PATTERN.findall(text.lower()))
+
+
+def _normalize_name(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+
+def _declared_name(properties: dict) -> str | None:
+    name = properties.get("name")
+    if isinstance(name, str) and name.strip():
+        return name
+    return None
+
+
+def _entity_name(properties: dict) -> str | None:
+    # The prompt asks for "name", but models sometimes use "title",
+    # "full_name" and the like; the first string value stands in for it.
+    # Only used to show entities to the LLM, never to identify them.
+    name = _declared_name(properties)
+    if name is not None:
+        return name
+    for value in properties.values():
+        if isinstance(value, str) and value.strip():
+            return value
+    return None
+
+
+def _entity_id(source_id: str, label: str, name: str) -> str:
+    key = f"{source_id}\0{label}\0{_normalize_name(name)}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def _scoped_entity_id(source_id: str, entity_id: str) -> str:
+    key = f"{source_id}\0{entity_id}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+# Parsers and their format instructions only depend on the model class, so
+# they are shared by the ingestors created for every ingestion request
+@lru_cache
+def _parser_for(schema: type[BaseModel]) -> PydanticOutputParser:
+    return PydanticOutputParser(pydantic_object=schema)
+
+
+@lru_cache
+def _format_instructions(schema: type[BaseModel]) -> str:
+    # Builds the JSON schema of the model
+    return _parser_for(schema).get_format_instructions()
+
+
+_ENTITY_LABELS_SLOT = "<<entity_labels>>"
+_RELATIONSHIP_RULES_SLOT = "<<relationship_rules>>"
+
+
+@lru_cache
+def _extraction_prompt_template(output_format: str) -> str:
+    # Rendered once with the ontology left as slots, so a new ontology only
+    # costs two str.replace calls instead of a Jinja render
+    return EXTRACTION_SYSTEM_PROMPT.invoke(
+        {
+            "entity_labels": _ENTITY_LABELS_SLOT,
+            "relationship_rules": _RELATIONSHIP_RULES_SLOT,
+            "output_format": output_format,
+        }
+    ).to_string()
+
+
+def _construct_extraction(data: dict) -> dict:
+    # Shape checks only; raises KeyError/TypeError when a full validation is
+    # needed to make sense of the output
+    entities = []
+    for entity in data["entities"]:
+        if not (
+            isinstance(entity["id"], str)
+            and isinstance(entity["entity_label"], str)
+            and isinstance(entity["properties"], dict)
+        ):
+            raise TypeError("Unexpected entity shape")
+        entities.append(
+            Entity.model_construct(
+                id=entity["id"],
+                entity_label=entity["entity_label"],
+                properties=entity["properties"],
+                doc_ids=set(),
+            )
+        )
+    triplets = []
+    for triplet in data["triplets"]:
+        if not (
+            isinstance(triplet["source_id"], str)
+            and isinstance(triplet["relationship"], str)
+            and isinstance(triplet["target_id"], str)
+        ):
+            raise TypeError("Unexpected triplet shape")
+        triplets.append(
+            Triplet.model_construct(
+                source_id=triplet["source_id"],
+                relationship=triplet["relationship"],
+                target_id=triplet["target_id"],
+            )
+        )
+    return {"entities": entities, "triplets": triplets}
+
+
+def _construct_parsed(
+    data: dict, schema: type[EntityRelationships | BatchEntityRelationships]
+) -> EntityRelationships | BatchEntityRelationships:
+    if schema is BatchEntityRelationships:
+        return BatchEntityRelationships.model_construct(
+            results=[
+                DocumentEntityRelationships.model_construct(
+                    doc_index=operator.index(result["doc_index"]),
+                    **_construct_extraction(result),
+                )
+                for result in data["results"]
+            ]
+        )
+    return EntityRelationships.model_construct(**_construct_extraction(data))
+
+
+def _fast_parse_extraction(
+    text: str | bytes, schema: type[EntityRelationships | BatchEntityRelationships]
+) -> EntityRelationships | BatchEntityRelationships | None:
+    """Parse trusted-shape JSON without running Pydantic validation.
+
+    Returns None when the output needs the regular parser (code fences with
+    prose around them, missing or mistyped fields, invalid JSON).
+    """
+    if isinstance(text, str):
+        text = _CODE_FENCE_PATTERN.sub("", text.strip())
+    try:
+        return _construct_parsed(orjson.loads(text), schema)
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        return None
+
+
+def _compact_triplets(triplets: list[dict]) -> str:
+    # Each entity is written once and relationships refer to it by position,
+    # instead of repeating both endpoints' properties in every triplet
+    entity_index: dict[bytes, int] = {}
+    relationships: list[list] = []
+    for triplet in triplets:
+        ends = []
+        for node in (triplet["source"], triplet["target"]):
+            key = orjson.dumps(node, option=orjson.OPT_SORT_KEYS)
+            ends.append(entity_index.setdefault(key, len(entity_index)))
+        relationships.append([ends[0], triplet["relationship"], ends[1]])
+    return orjson.dumps(
+        {
+            "entities": [orjson.Fragment(entity) for entity in entity_index],
+            "relationships": relationships,
+        }
+    ).decode()
+
 
 class PropertyGraphIngestor(BaseIngestor):
 
@@ -30,6 +219,22 @@ class PropertyGraphIngestor(BaseIngestor):
         extract_community_summaries: bool = True,
         ontology: Ontology | None = None,
         knowledge_base_service: KnowledgeBaseService | None = None,
+        max_context_entities: int = 200,
+        use_structured_output: bool = True,
+        summary_batch_size: int = 128,
+        max_concurrency: int = 4,
+        extraction_wave_size: int = 8,
+        max_write_workers: int = 16,
+        write_batch_size: int = 1000,
+        use_batch_api: bool = False,
+        batch_api_threshold: int = 100,
+        batch_poll_interval: float = 30.0,
+        extraction_cache: ExtractionCache | None = None,
+        max_parse_retries: int = 2,
+        resolve_entities: bool = True,
+        documents_per_request: int = 1,
+        max_request_chars: int | None = None,
+        max_summary_failure_ratio: float = 0.1,
     ):
         logging.debug("Initializing PropertyGraphIngestor")
         self.llm = llm
@@ -37,308 +242,926 @@ class PropertyGraphIngestor(BaseIngestor):
         self.extract_community_summaries = extract_community_summaries
         self.ontology = ontology
         self.knowledge_base_service = knowledge_base_service
+        # Upper bound on the number of previously extracted entities sent back
+        # to the LLM as context, keeps the prompt from growing with the file.
+        # The entities sharing the most tokens with the document are chosen.
+        self.max_context_entities = max_context_entities
+        self.use_structured_output = use_structured_output
+        self.summary_batch_size = summary_batch_size
+        # Concurrent LLM requests in flight during extraction
+        self.max_concurrency = max_concurrency
+        # Documents in flight at once; they do not see each other's entities
+        self.extraction_wave_size = extraction_wave_size
+        # Keep at or below the Neo4j server's worker thread count
+        self.max_write_workers = max_write_workers
+        # Rows per UNWIND write, bounds the size of a single transaction
+        self.write_batch_size = write_batch_size
+        # Files with more than batch_api_threshold documents are extracted
+        # through the OpenAI Batch API (cheaper, but completes asynchronously)
+        self.use_batch_api = use_batch_api
+        self.batch_api_threshold = batch_api_threshold
+        self.batch_poll_interval = batch_poll_interval
+        if self.use_batch_api and getattr(self.llm, "root_client", None) is None:
+            raise ValueError(
+                "use_batch_api requires an OpenAI chat model exposing root_client."
+            )
+        self.extraction_cache = extraction_cache
+        # Extra attempts, with the parsing error fed back, before giving up
+        self.max_parse_retries = max_parse_retries
+        # Merge entities with the same label and name after extraction
+        self.resolve_entities = resolve_entities
+        # Short documents can share one request, saving round-trips and
+        # repeated prefill of the system prompt
+        self.documents_per_request = documents_per_request
+        # Optional cap on the combined text of a multi-document request, so
+        # documents of very different lengths don't build one oversized prompt
+        self.max_request_chars = max_request_chars
+        if self.use_batch_api and self.documents_per_request > 1:
+            raise ValueError(
+                "documents_per_request > 1 is not supported with use_batch_api."
+            )
+        # Share of a file's communities allowed to fail summarization before
+        # the ingest is failed instead of leaving them without summaries
+        self.max_summary_failure_ratio = max_summary_failure_ratio
 
         self.knowledge_base: KnowledgeBase | None = None
+        self._setup_lock = threading.Lock()
 
-        self._ontology_parser = PydanticOutputParser(pydantic_object=Ontology)
-        self._triplet_parser = PydanticOutputParser(pydantic_object=EntityRelationships)
-
-        self._ontology_system_prompt = ONTOLOGY_SYSTEM_PROMPT.partial(
-            output_format=self._ontology_parser.get_format_instructions()
+        self._ontology_parser = _parser_for(Ontology)
+        self._triplet_parser = _parser_for(EntityRelationships)
+        self._extraction_schema: type[
+            EntityRelationships | BatchEntityRelationships
+        ] = (
+            BatchEntityRelationships
+            if self.documents_per_request > 1
+            else EntityRelationships
         )
-        self._extraction_system_prompt = EXTRACTION_SYSTEM_PROMPT.partial(
-            output_format=self._triplet_parser.get_format_instructions()
+        self._extraction_parser = _parser_for(self._extraction_schema)
+
+        self._ontology_system_prompt = ONTOLOGY_SYSTEM_PROMPT.invoke(
+            {"output_format": _format_instructions(Ontology)}
+        ).to_string()
+        if self.use_structured_output:
+            # Same forced tool call as with_structured_output(method=
+            # "function_calling"), but the arguments are parsed in
+            # _parse_extraction so well-formed output skips validation
+            tool_name = convert_to_openai_tool(self._extraction_schema)["function"][
+                "name"
+            ]
+            self._structured_llm = self.llm.bind_tools(
+                [self._extraction_schema], tool_choice=tool_name
+            )
+            # The provider enforces the schema through tool calling, so the
+            # format instructions are left out of the prompt
+            self._extraction_prompt_template = _extraction_prompt_template("")
+        else:
+            self._extraction_prompt_template = _extraction_prompt_template(
+                _format_instructions(self._extraction_schema)
+            )
+        # Everything before the per-document entity list, rendered once
+        self._existing_entities_prefix = (
+            EXISTING_ENTITIES_PROMPT.invoke({"existing_entities": ""})
+            .to_string()
+            .rstrip()
+            + "\n"
         )
-        self._community_summarization_sys_prompt = (
+        self._extraction_ontology: Ontology | None = None
+        self._extraction_system_message: SystemMessage | None = None
+        # Messages are immutable once built, so every summary request
+        # shares this one
+        self._community_summarization_sys_message = SystemMessage(
             COMMUNITY_SUMMARIZATION_SYSTEM_PROMPT.invoke({}).to_string()
         )
 
         self.vector_store.create_new_index()
+        self._create_constraints()
         logging.debug("PropertyGraphIngestor initialization complete")
 
+    def _create_constraints(self):
+        logging.debug("Ensuring graph constraints")
+        # Without these every MERGE/MATCH on id or source_id is a label scan.
+        # Extracted entities carry the shared Entity label next to their
+        # ontology label so a single constraint covers all of them.
+        for statement in (
+            "CREATE CONSTRAINT chunk_id IF NOT EXISTS "
+            "FOR (c:Chunk) REQUIRE c.id IS UNIQUE",
+            "CREATE CONSTRAINT entity_id IF NOT EXISTS "
+            "FOR (e:Entity) REQUIRE e.id IS UNIQUE",
+            "CREATE CONSTRAINT community_id IF NOT EXISTS "
+            "FOR (c:Community) REQUIRE c.id IS UNIQUE",
+            "CREATE INDEX entity_source_id IF NOT EXISTS "
+            "FOR (e:Entity) ON (e.source_id)",
+            "CREATE INDEX community_source_id IF NOT EXISTS "
+            "FOR (c:Community) ON (c.source_id)",
+            "CREATE INDEX community_knowledge_base_id IF NOT EXISTS "
+            "FOR (c:Community) ON (c.knowledge_base_id)",
+        ):
+            self.vector_store.query(statement)
+
     def ingest(
         self,
         knowledge_base: KnowledgeBase,
         file_metadata: FileMetadata,
         documents: list[Document],
+    ):
+        # Runs on a loop of its own; callers ingesting more than one file, or
+        # sharing the llm with another loop, await aingest instead
+        asyncio.run(self.aingest(knowledge_base, file_metadata, documents))
+
+    async def aingest(
+        self,
+        knowledge_base: KnowledgeBase,
+        file_metadata: FileMetadata,
+        documents: list[Document],
     ):
         logging.debug(
-            f"Starting ingestion for file: {file_metadata['name']}, documents count: {len(documents)}"
-        )
-        if not self.ontology:
-            logging.debug("Ontology not found, extracting from knowledge base")
-            if not knowledge_base.ontology:
-                logging.debug("Extracting ontology from knowledge extraction prompt")
-                knowledge_base.ontology = self._extract_ontology(
-                    knowledge_base.knowledge_extraction_prompt
-                )
-                logging.debug(
-                    f"Ontology extracted with {len(knowledge_base.ontology.entity_labels)} entity labels"
-                )
-                self.knowledge_base_service.upsert(knowledge_base)
-                logging.debug("Ontology saved to knowledge base")
-            self.ontology = knowledge_base.ontology
+            "Starting ingestion for file: %s, documents count: %s",
+            file_metadata["name"],
+            len(documents),
+        )
+        await asyncio.to_thread(self._prepare_extraction, knowledge_base)
 
-        if not self.knowledge_base:
-            self.knowledge_base = knowledge_base
+        logging.debug("Performing NER for %s", file_metadata["name"])
+        entities, triplets = await self._aextract_entities(documents)
+        logging.debug("Completed NER for %s", file_metadata["name"])
+        logging.debug("Total unique entities before ID reassignment: %s", len(entities))
 
-        entities: list[Entity] = []
-        triplets: list[Triplet] = []
+        if self.resolve_entities:
+            entities, triplets = self._resolve_entities(entities, triplets)
 
-        entity_storage: dict[str, Entity] = {}
+        logging.debug("Reassigning entity IDs")
+        entities, triplets = self._reassign_entity_ids(
+            entities, triplets, file_metadata["id"]
+        )
+        logging.debug("Entities Extracted: %s", len(entities))
+        logging.debug("Triplets Identified: %s", len(triplets))
+
+        node_labels, relationship_labels = await asyncio.to_thread(
+            self._write_graph, file_metadata, entities, triplets
+        )
 
-        logging.debug(f"Performing NER for {file_metadata['name']}")
-        for idx, document in enumerate(documents):
+        if self.extract_community_summaries:
             logging.debug(
-                f"Processing document {idx + 1}/{len(documents)}: {document.id}"
+                "Extracting Community Summaries for %s", file_metadata["name"]
             )
-            current_context_entities = list(entity_storage.values())
+            if not self.llm:
+                raise ValueError(
+                    "llm must be provided when extract_community_summaries is True. "
+                    "Please provide a BaseChatModel instance during initialization."
+                )
             logging.debug(
-                f"Current context has {len(current_context_entities)} entities"
+                "Community summary extraction enabled, processing with node_labels=%s, relationship_labels=%s",
+                len(node_labels),
+                len(relationship_labels),
             )
-            extraction = self._apply_ontology_to_doc(document, current_context_entities)
-            logging.debug(
-                f"Extracted {len(extraction.entities)} entities and {len(extraction.triplets)} triplets from document"
+            await self._aextract_community_summaries(
+                file_metadata, node_labels, relationship_labels
             )
+            logging.debug("Completed Community Summary Extraction")
 
-            for ent in extraction.entities:
-                # Update doc_ids for the newly extracted entity
-                ent.doc_ids.add(document.id)
-                if ent.id in entity_storage:
-                    logging.debug(f"Updating existing entity: {ent.id}")
-                    entity_storage[ent.id].properties.update(ent.properties)
-                    # Update doc_ids on the existing record
-                    entity_storage[ent.id].doc_ids.add(document.id)
-                else:
-                    logging.debug(f"Adding new entity: {ent.id} ({ent.entity_label})")
-                    entity_storage[ent.id] = ent
-            triplets.extend(extraction.triplets)
-        logging.debug(f"Completed NER for {file_metadata['name']}")
+        logging.debug("Ingestion complete for file: %s", file_metadata["name"])
 
-        entities = list(entity_storage.values())
-        logging.debug(f"Total unique entities before ID reassignment: {len(entities)}")
+    def _prepare_extraction(self, knowledge_base: KnowledgeBase):
+        # Files may be ingested concurrently; the first one resolves the
+        # ontology and renders the shared prompt for the others
+        with self._setup_lock:
+            if not self.ontology:
+                logging.debug("Ontology not found, extracting from knowledge base")
+                if not knowledge_base.ontology:
+                    logging.debug(
+                        "Extracting ontology from knowledge extraction prompt"
+                    )
+                    knowledge_base.ontology = self._extract_ontology(
+                        knowledge_base.knowledge_extraction_prompt
+                    )
+                    logging.debug(
+                        "Ontology extracted with %s entity labels",
+                        len(knowledge_base.ontology.entity_labels),
+                    )
+                    self.knowledge_base_service.upsert(knowledge_base)
+                    logging.debug("Ontology saved to knowledge base")
+                self.ontology = knowledge_base.ontology
 
-        logging.debug("Reassigning entity IDs")
-        entities, triplets = self._reassign_entity_ids(entities, triplets)
-        logging.debug(f"Entities Extracted: {len(entities)}")
-        logging.debug(f"Triplets Identified: {len(triplets)}")
+            if not self.knowledge_base:
+                self.knowledge_base = knowledge_base
 
-        node_labels: list[str] = ["Chunk"]
-        relationship_labels: list[str] = ["SIMILAR"]
-        logging.debug("Creating entity nodes and relationships")
-        for idx, entity in enumerate(entities):
-            logging.debug(
-                f"Creating entity {idx + 1}/{len(entities)}: {entity.id} ({entity.entity_label})"
-            )
-            node_labels.append(entity.entity_label)
-            self._create_entity_and_links(entity, file_metadata)
-        logging.debug(f"Created {len(entities)} entity nodes")
+            # Static part of the extraction prompt, shared by every document and
+            # only re-rendered when the ontology changes
+            if self._extraction_ontology is not self.ontology:
+                self._extraction_system_message = SystemMessage(
+                    self._extraction_prompt_template.replace(
+                        _ENTITY_LABELS_SLOT, str(self.ontology.entity_labels)
+                    ).replace(
+                        _RELATIONSHIP_RULES_SLOT, str(self.ontology.relationship_rules)
+                    )
+                )
+                self._extraction_ontology = self.ontology
 
-        logging.debug("Creating triplet relationships")
-        for idx, triplet in enumerate(triplets):
-            logging.debug(
-                f"Creating triplet {idx + 1}/{len(triplets)}: {triplet.source_id} -[{triplet.relationship}]-> {triplet.target_id}"
+    def _write_graph(
+        self,
+        file_metadata: FileMetadata,
+        entities: list[Entity],
+        triplets: list[Triplet],
+    ) -> tuple[list[str], list[str]]:
+        # Group entities and triplets in one pass each; the distinct labels
+        # needed for the community projection fall out of the group keys
+        entities_by_label: dict[str, list[Entity]] = defaultdict(list)
+        for entity in entities:
+            entities_by_label[entity.entity_label].append(entity)
+        triplets_by_relationship: dict[str, list[Triplet]] = defaultdict(list)
+        for triplet in triplets:
+            triplets_by_relationship[triplet.relationship].append(triplet)
+
+        node_labels: list[str] = ["Chunk", *entities_by_label]
+        relationship_labels: list[str] = ["SIMILAR", *triplets_by_relationship]
+
+        logging.debug("Creating chunk nodes")
+        self._create_chunk_nodes(entities)
+
+        # Each label and relationship type is written with UNWIND in batches
+        # of write_batch_size rows, and the batches run on a thread pool to
+        # overlap Bolt round-trips. Entities must all exist before any
+        # triplet between them is merged.
+        entity_batches = [
+            (label, batch)
+            for label, label_entities in entities_by_label.items()
+            for batch in batched(label_entities, self.write_batch_size)
+        ]
+        triplet_batches = [
+            (relationship, batch)
+            for relationship, rel_triplets in triplets_by_relationship.items()
+            for batch in batched(rel_triplets, self.write_batch_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_write_workers) as executor:
+            logging.debug("Creating entity nodes and relationships")
+            list(
+                executor.map(
+                    lambda args: self._create_entities(*args, file_metadata),
+                    entity_batches,
+                )
             )
-            relationship_labels.append(triplet.relationship)
-            self._create_triplet_relationship(triplet)
-        logging.debug(f"Created {len(triplets)} relationships")
+            logging.debug("Created %s entity nodes", len(entities))
 
-        if self.extract_community_summaries:
-            logging.debug(f"Extracting Community Summaries for {file_metadata['name']}")
-            if not self.llm:
-                raise ValueError(
-                    "llm must be provided when extract_community_summaries is True. "
-                    "Please provide a BaseChatModel instance during initialization."
+            logging.debug("Creating triplet relationships")
+            list(
+                executor.map(
+                    lambda args: self._create_triplet_relationships(*args),
+                    triplet_batches,
                 )
+            )
+        logging.debug("Created %s relationships", len(triplets))
+        return node_labels, relationship_labels
+
+    async def _aextract_entities(
+        self, documents: list[Document]
+    ) -> tuple[list[Entity], list[Triplet]]:
+        triplets: list[Triplet] = []
+        entity_storage: dict[str, Entity] = {}
+        # Token of a property value -> ids of the entities it appears in, used
+        # to pick the entities relevant to a document
+        entity_token_index: dict[str, set[str]] = defaultdict(set)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def extract(
+            group: tuple[Document, ...], context: bytes
+        ) -> list[EntityRelationships]:
+            async with semaphore:
+                if self.documents_per_request == 1:
+                    return [await self._aapply_ontology_to_doc(group[0], context)]
+                return await self._aapply_ontology_to_docs(group, context)
+
+        def merge(document: Document, extraction: EntityRelationships):
             logging.debug(
-                f"Community summary extraction enabled, processing with node_labels={len(node_labels)}, relationship_labels={len(relationship_labels)}"
+                "Extracted %s entities and %s triplets from document %s",
+                len(extraction.entities),
+                len(extraction.triplets),
+                document.id,
             )
-            self._extract_community_summaries(
-                file_metadata, node_labels, relationship_labels
+            doc_id = document.id
+            for ent in extraction.entities:
+                entity_id = ent.id
+                properties = ent.properties
+                existing = entity_storage.get(entity_id)
+                if existing is None:
+                    logging.debug(
+                        "Adding new entity: %s (%s)", entity_id, ent.entity_label
+                    )
+                    ent.doc_ids.add(doc_id)
+                    entity_storage[entity_id] = ent
+                else:
+                    logging.debug("Updating existing entity: %s", entity_id)
+                    existing.properties.update(properties)
+                    existing.doc_ids.add(doc_id)
+                for value in properties.values():
+                    if isinstance(value, str):
+                        for token in _tokenize(value):
+                            entity_token_index[token].add(entity_id)
+            triplets.extend(extraction.triplets)
+
+        if self.use_batch_api and len(documents) > self.batch_api_threshold:
+            # A single provider batch has no earlier results to share, so every
+            # document is extracted without existing entities as context
+            extractions = await asyncio.to_thread(self._batch_apply_ontology, documents)
+            for document, extraction in zip(documents, extractions):
+                merge(document, extraction)
+            return list(entity_storage.values()), triplets
+
+        # Groups of documents_per_request documents are extracted through a
+        # sliding window of extraction_wave_size in-flight requests. A group's
+        # context is taken when it is launched, from every document merged so
+        # far, and results are merged in document order, so ID reuse stays
+        # deterministic while a slow request never holds up a whole wave.
+        # Duplicates between in-flight documents are merged by ID like any
+        # other repeat mention.
+        groups = self._group_documents(documents)
+        in_flight: deque[tuple[tuple[Document, ...], asyncio.Task]] = deque()
+        # Repeated chunks (headers, footers, disclaimers) share the first
+        # request for the same text instead of being extracted again
+        launched: dict[tuple[str, ...], asyncio.Task] = {}
+        for idx, group in enumerate(groups):
+            if len(in_flight) >= self.extraction_wave_size:
+                done_group, task = in_flight.popleft()
+                for document, extraction in zip(done_group, await task):
+                    merge(document, extraction)
+            contents = tuple(document.page_content for document in group)
+            if contents in launched:
+                logging.debug("Request %s/%s is a duplicate", idx + 1, len(groups))
+                in_flight.append((group, launched[contents]))
+                continue
+            logging.debug("Processing request %s/%s", idx + 1, len(groups))
+            context = self._select_context_entities(
+                " ".join(contents), entity_storage, entity_token_index
             )
-            logging.debug(f"Completed Community Summary Extraction")
+            launched[contents] = asyncio.create_task(extract(group, context))
+            in_flight.append((group, launched[contents]))
 
-        logging.debug(f"Ingestion complete for file: {file_metadata['name']}")
+        while in_flight:
+            done_group, task = in_flight.popleft()
+            for document, extraction in zip(done_group, await task):
+                merge(document, extraction)
+
+        return list(entity_storage.values()), triplets
+
+    def _group_documents(self, documents: list[Document]) -> list[tuple[Document, ...]]:
+        if self.max_request_chars is None:
+            return list(batched(documents, self.documents_per_request))
+        # Consecutive documents only, extraction order decides ID reuse
+        groups: list[tuple[Document, ...]] = []
+        group: list[Document] = []
+        group_chars = 0
+        for document in documents:
+            doc_chars = len(document.page_content)
+            if group and (
+                len(group) == self.documents_per_request
+                or group_chars + doc_chars > self.max_request_chars
+            ):
+                groups.append(tuple(group))
+                group, group_chars = [], 0
+            group.append(document)
+            group_chars += doc_chars
+        if group:
+            groups.append(tuple(group))
+        return groups
+
+    def _select_context_entities(
+        self,
+        text: str,
+        entity_storage: dict[str, Entity],
+        entity_token_index: dict[str, set[str]],
+    ) -> bytes:
+        # Tokens shared by a large share of the entities ("the", "and", a
+        # company name on every page) can't tell them apart, and walking
+        # their ids for every document would grow with the whole file
+        max_postings = max(
+            self.max_context_entities,
+            int(len(entity_storage) * _COMMON_TOKEN_RATIO),
+        )
+        overlap: Counter[str] = Counter()
+        for token in _tokenize(text):
+            entity_ids = entity_token_index.get(token, ())
+            if len(entity_ids) <= max_postings:
+                overlap.update(entity_ids)
+        context = [
+            entity_storage[entity_id]
+            for entity_id, _ in overlap.most_common(self.max_context_entities)
+        ]
+        logging.debug("Selected %s context entities", len(context))
+        # Projected here rather than when the request is sent, since entities
+        # keep being merged while the request waits for a slot
+        return self._project_entities_for_prompt(context)
+
+    @staticmethod
+    def _project_entities_for_prompt(entities: list[Entity]) -> bytes:
+        # Only what the LLM needs to reuse an ID, as parallel arrays so keys
+        # aren't repeated per entity; new properties are merged on our side
+        ids, labels, names = [], [], []
+        for entity in entities:
+            ids.append(entity.id)
+            labels.append(entity.entity_label)
+            names.append(_entity_name(entity.properties))
+        return orjson.dumps({"ids": ids, "labels": labels, "names": names})
 
     def _extract_ontology(self, knowledge_extraction_prompt: str) -> Ontology:
+        messages = [
+            SystemMessage(self._ontology_system_prompt),
+            HumanMessage(knowledge_extraction_prompt),
+        ]
+        # Knowledge bases created from the same description share the ontology
+        cache_key = None
+        if self.extraction_cache:
+            cache_key = ExtractionCache.make_key(
+                self._model_name(), *(message.content for message in messages)
+            )
+            cached = self.extraction_cache.get(cache_key, Ontology)
+            if cached:
+                logging.debug("Using cached ontology")
+                return cached
         logging.debug("Invoking LLM to extract ontology")
-        res = self.llm.invoke(
-            [
-                SystemMessage(self._ontology_system_prompt.invoke({}).to_string()),
-                HumanMessage(knowledge_extraction_prompt),
-            ]
-        )
+        res = self.llm.invoke(messages)
         logging.debug("Parsing ontology response")
         parsed: Ontology = self._ontology_parser.invoke(res.content)
         logging.debug(
-            f"Ontology parsed successfully: {len(parsed.entity_labels)} entity labels, {len(parsed.relationship_rules)} relationship rules"
+            "Ontology parsed successfully: %s entity labels, %s relationship rules",
+            len(parsed.entity_labels),
+            len(parsed.relationship_rules),
         )
+        if cache_key:
+            self.extraction_cache.put(cache_key, parsed)
         return parsed
 
-    def _apply_ontology_to_doc(
-        self, document: Document, existing_entities: list[Entity]
-    ) -> EntityRelationships:
-        logging.debug(
-            f"Applying ontology to document: {document.id}, existing entities: {len(existing_entities)}"
+    def _build_extraction_messages(
+        self, text: str, existing_entities: bytes
+    ) -> list[SystemMessage | HumanMessage]:
+        logging.debug("Building extraction prompt")
+        # Static ontology first, per-document content last, so consecutive
+        # requests share the longest possible cacheable prefix
+        existing_entities_prompt = (
+            self._existing_entities_prefix + existing_entities.decode()
         )
-
-        # Convert entities to dicts while explicitly hiding the doc_ids
-        serializable_entities = [
-            ent.model_dump(exclude={"doc_ids"}) for ent in existing_entities
+        return [
+            self._extraction_system_message,
+            SystemMessage(existing_entities_prompt),
+            HumanMessage(text),
         ]
+
+    def _model_name(self) -> str:
+        return str(
+            getattr(self.llm, "model_name", None) or getattr(self.llm, "model", "")
+        )
+
+    def _extraction_cache_key(
+        self, messages: list[SystemMessage | HumanMessage]
+    ) -> str:
+        # The rendered messages cover the prompt version, the ontology, the
+        # context entities and the document text
+        return ExtractionCache.make_key(
+            self._model_name(),
+            str(self.use_structured_output),
+            *(message.content for message in messages),
+        )
+
+    def _get_cached_extraction(
+        self, label: str, messages: list[SystemMessage | HumanMessage]
+    ) -> tuple[str | None, EntityRelationships | BatchEntityRelationships | None]:
+        if not self.extraction_cache:
+            return None, None
+        cache_key = self._extraction_cache_key(messages)
+        cached = self.extraction_cache.get(cache_key, self._extraction_schema)
+        if cached:
+            logging.debug("Extraction cache hit for %s", label)
+        return cache_key, cached
+
+    async def _aapply_ontology_to_doc(
+        self, document: Document, existing_entities: bytes
+    ) -> EntityRelationships:
         logging.debug(
-            f"Prepared {len(serializable_entities)} entities for serialization"
+            "Applying ontology to document: %s, existing entities: %s bytes",
+            document.id,
+            len(existing_entities),
         )
 
-        logging.debug("Building extraction prompt")
-        sytem_prompt = self._extraction_system_prompt.invoke(
-            {
-                "entity_labels": self.ontology.entity_labels,
-                "relationship_rules": self.ontology.relationship_rules,
-                "existing_entities": serializable_entities,
-            }
-        ).to_string()
-        logging.debug("Invoking LLM for entity and relationship extraction")
-        res = self.llm.invoke(
-            [SystemMessage(sytem_prompt), HumanMessage(document.page_content)]
+        messages = self._build_extraction_messages(
+            document.page_content, existing_entities
         )
-        logging.debug("Parsing entity and relationship extraction response")
-        parsed: EntityRelationships = self._triplet_parser.invoke(res)
+        cache_key, cached = self._get_cached_extraction(document.id, messages)
+        if cached:
+            return cached
+
+        parsed = await self._ainvoke_extraction(document.id, messages)
         logging.debug(
-            f"Extraction complete: {len(parsed.entities)} entities, {len(parsed.triplets)} relationships"
+            "Extraction complete: %s entities, %s relationships",
+            len(parsed.entities),
+            len(parsed.triplets),
         )
+        if cache_key:
+            self.extraction_cache.put(cache_key, parsed)
         return parsed
 
-    def _reassign_entity_ids(
-        self, entities: list[Entity], triplets: list[Triplet]
-    ) -> tuple[list[Entity], list[Triplet]]:
+    async def _aapply_ontology_to_docs(
+        self, documents: tuple[Document, ...], existing_entities: bytes
+    ) -> list[EntityRelationships]:
+        label = f"documents {documents[0].id}..{documents[-1].id}"
         logging.debug(
-            f"Reassigning IDs for {len(entities)} entities and {len(triplets)} triplets"
+            "Applying ontology to %s, existing entities: %s bytes",
+            label,
+            len(existing_entities),
         )
 
-        id_map: dict[str, str] = {}
-        new_entities: list[Entity] = []
+        inputs = orjson.dumps(
+            [
+                {"doc_index": idx, "text": document.page_content}
+                for idx, document in enumerate(documents)
+            ]
+        ).decode()
+        messages = self._build_extraction_messages(
+            "Extract entities and relationships from each document below "
+            "independently and return one result per doc_index.\n" + inputs,
+            existing_entities,
+        )
+        cache_key, parsed = self._get_cached_extraction(label, messages)
+        if not parsed:
+            parsed = await self._ainvoke_extraction(label, messages)
+            if cache_key:
+                self.extraction_cache.put(cache_key, parsed)
 
-        for idx, entity in enumerate(entities):
-            new_id = str(uuid.uuid4().hex)
-            id_map[entity.id] = new_id
-            logging.debug(
-                f"Mapped entity {idx + 1}/{len(entities)}: {entity.id} -> {new_id}"
+        results = {result.doc_index: result for result in parsed.results}
+        if len(results) != len(documents):
+            logging.warning(
+                "Expected %s results for %s, got %s",
+                len(documents),
+                label,
+                len(results),
+            )
+        return [
+            results.get(idx, EntityRelationships(entities=[], triplets=[]))
+            for idx in range(len(documents))
+        ]
+
+    async def _ainvoke_extraction(
+        self, label: str, messages: list[SystemMessage | HumanMessage]
+    ) -> EntityRelationships | BatchEntityRelationships:
+        logging.debug("Invoking LLM for entity and relationship extraction")
+        for attempt in range(self.max_parse_retries + 1):
+            if self.use_structured_output:
+                res = await self._structured_llm.ainvoke(messages)
+            else:
+                res = await self.llm.ainvoke(messages)
+            raw, parsed, error = self._parse_extraction(res)
+            if error is None:
+                break
+            if attempt == self.max_parse_retries:
+                raise error
+            logging.warning(
+                "Extraction for %s failed to parse (attempt %s/%s): %s",
+                label,
+                attempt + 1,
+                self.max_parse_retries + 1,
+                error,
             )
+            messages = [*messages, *self._parse_feedback_messages(raw, error)]
+            await asyncio.sleep(1.0 * (attempt + 1))
+        return parsed
 
-            new_entities.append(
-                Entity(
-                    id=new_id,
-                    entity_label=entity.entity_label,
-                    properties=deepcopy(entity.properties),
-                    doc_ids=set(entity.doc_ids),
+    def _parse_extraction(self, res: AIMessage) -> tuple[
+        AIMessage,
+        EntityRelationships | BatchEntityRelationships | None,
+        Exception | None,
+    ]:
+        if self.use_structured_output:
+            if not res.tool_calls:
+                if res.invalid_tool_calls:
+                    return (
+                        res,
+                        None,
+                        OutputParserException(
+                            res.invalid_tool_calls[0]["error"]
+                            or "The tool call arguments are not valid JSON."
+                        ),
+                    )
+                return (
+                    res,
+                    None,
+                    OutputParserException("The model did not call the tool."),
                 )
+            args = res.tool_calls[0]["args"]
+            try:
+                return res, _construct_parsed(args, self._extraction_schema), None
+            except (KeyError, TypeError):
+                pass
+            try:
+                return res, self._extraction_schema.model_validate(args), None
+            except ValidationError as e:
+                return res, None, e
+        parsed = _fast_parse_extraction(res.content, self._extraction_schema)
+        if parsed:
+            return res, parsed, None
+        try:
+            return res, self._extraction_parser.invoke(res), None
+        except OutputParserException as e:
+            return res, None, e
+
+    def _parse_feedback_messages(
+        self, raw: AIMessage, error: Exception
+    ) -> list[AIMessage | HumanMessage | ToolMessage]:
+        feedback = f"Your output had an error: {error}. Fix it and answer again."
+        tool_calls = [*raw.tool_calls, *raw.invalid_tool_calls]
+        if tool_calls:
+            # Every tool call has to be answered before the next user turn
+            return [
+                raw,
+                *[
+                    ToolMessage(feedback, tool_call_id=tool_call["id"])
+                    for tool_call in tool_calls
+                ],
+            ]
+        return [raw, HumanMessage(feedback)]
+
+    def _batch_apply_ontology(
+        self, documents: list[Document]
+    ) -> list[EntityRelationships]:
+        body: dict = {"model": self.llm.model_name}
+        if self.llm.temperature is not None:
+            body["temperature"] = self.llm.temperature
+        if self.use_structured_output:
+            # Same forced tool call as with_structured_output(method="function_calling")
+            tool = convert_to_openai_tool(EntityRelationships)
+            body["tools"] = [tool]
+            body["tool_choice"] = {
+                "type": "function",
+                "function": {"name": tool["function"]["name"]},
+            }
+
+        results: dict[str, EntityRelationships] = {}
+        cache_keys: dict[str, str] = {}
+        requests = []
+        for document in documents:
+            messages = self._build_extraction_messages(
+                document.page_content, self._project_entities_for_prompt([])
+            )
+            cache_key, cached = self._get_cached_extraction(document.id, messages)
+            if cached:
+                results[document.id] = cached
+                continue
+            if cache_key:
+                cache_keys[document.id] = cache_key
+            requests.append(
+                {
+                    "custom_id": document.id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        **body,
+                        "messages": [
+                            {
+                                "role": (
+                                    "system"
+                                    if isinstance(message, SystemMessage)
+                                    else "user"
+                                ),
+                                "content": message.content,
+                            }
+                            for message in messages
+                        ],
+                    },
+                }
             )
 
-        logging.debug(
-            f"Created {len(new_entities)} new entity objects with reassigned IDs"
+        if requests:
+            self._run_extraction_batch(requests, results)
+            for doc_id, cache_key in cache_keys.items():
+                if doc_id in results:
+                    self.extraction_cache.put(cache_key, results[doc_id])
+
+        # Documents whose request failed contribute nothing
+        return [
+            results.get(document.id, EntityRelationships(entities=[], triplets=[]))
+            for document in documents
+        ]
+
+    def _run_extraction_batch(
+        self, requests: list[dict], results: dict[str, EntityRelationships]
+    ):
+        client = self.llm.root_client
+        logging.debug("Uploading batch of %s extraction requests", len(requests))
+        batch_file = client.files.create(
+            file=(
+                "extraction.jsonl",
+                b"\n".join(orjson.dumps(request) for request in requests),
+            ),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
         )
-        new_triplets: list[Triplet] = []
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            logging.debug("Batch %s status: %s", batch.id, batch.status)
+            time.sleep(self.batch_poll_interval)
+            batch = client.batches.retrieve(batch.id)
 
-        for idx, triplet in enumerate(triplets):
-            if triplet.source_id not in id_map or triplet.target_id not in id_map:
-                logging.debug(
-                    f"Skipping triplet {idx + 1}/{len(triplets)}: missing source or target ID mapping"
-                )
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Extraction batch {batch.id} ended as {batch.status}")
+
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line:
                 continue
-            logging.debug(
-                f"Mapping triplet {idx + 1}/{len(triplets)}: {id_map[triplet.source_id]} -[{triplet.relationship}]-> {id_map[triplet.target_id]}"
-            )
-            new_triplets.append(
-                Triplet(
-                    source_id=id_map[triplet.source_id],
-                    relationship=triplet.relationship,
-                    target_id=id_map[triplet.target_id],
-                )
+            row = orjson.loads(line)
+            doc_id = row["custom_id"]
+            try:
+                message = row["response"]["body"]["choices"][0]["message"]
+                if self.use_structured_output:
+                    arguments = message["tool_calls"][0]["function"]["arguments"]
+                    results[doc_id] = _fast_parse_extraction(
+                        arguments, EntityRelationships
+                    ) or EntityRelationships.model_validate_json(arguments)
+                else:
+                    results[doc_id] = _fast_parse_extraction(
+                        message["content"], EntityRelationships
+                    ) or self._triplet_parser.invoke(message["content"])
+            except Exception as e:
+                logging.error("Failed to parse extraction for %s: %s", doc_id, e)
+
+    def _resolve_entities(
+        self, entities: list[Entity], triplets: list[Triplet]
+    ) -> tuple[list[Entity], list[Triplet]]:
+        # Documents extracted concurrently (or through the Batch API) cannot
+        # reuse each other's ids, so the same entity may come back under
+        # several ids. Entities sharing a label and a normalized name are
+        # merged into the first one seen; entities without a "name" are
+        # never merged.
+        canonical: dict[tuple[str, str], Entity] = {}
+        aliases: dict[str, str] = {}
+        resolved: list[Entity] = []
+        for entity in entities:
+            name = _declared_name(entity.properties)
+            if name is None:
+                resolved.append(entity)
+                continue
+            key = (entity.entity_label, _normalize_name(name))
+            if key not in canonical:
+                canonical[key] = entity
+                resolved.append(entity)
+                continue
+            target = canonical[key]
+            target.properties.update(entity.properties)
+            target.doc_ids.update(entity.doc_ids)
+            aliases[entity.id] = target.id
+
+        if aliases:
+            for triplet in triplets:
+                triplet.source_id = aliases.get(triplet.source_id, triplet.source_id)
+                triplet.target_id = aliases.get(triplet.target_id, triplet.target_id)
+        logging.debug("Resolved %s duplicate entities", len(aliases))
+        return resolved, triplets
+
+    def _reassign_entity_ids(
+        self, entities: list[Entity], triplets: list[Triplet], source_id: str
+    ) -> tuple[list[Entity], list[Triplet]]:
+        logging.debug(
+            "Reassigning IDs for %s entities and %s triplets",
+            len(entities),
+            len(triplets),
+        )
+
+        # Entities are owned by the current ingest call, so their ids are
+        # rewritten in place rather than copied into new models.
+        # Entities with a "name" get an id derived from the file, label and
+        # name; the rest keep the id the LLM gave them, scoped to the file.
+        # The file id is part of the key because entity nodes belong to one
+        # file while Entity.id is unique across the database; it is random per
+        # read, so these ids do not carry over to a later ingest of the same
+        # file. Any clash left (e.g. a repeated name when resolve_entities is
+        # off) gets a random id from one urandom call instead of one per
+        # uuid4().
+        random_bytes = os.urandom(16 * len(entities))
+        id_map: dict[str, str] = {}
+        used_ids: set[str] = set()
+        for idx, entity in enumerate(entities):
+            name = _declared_name(entity.properties)
+            if name is not None:
+                new_id = _entity_id(source_id, entity.entity_label, name)
+            else:
+                new_id = _scoped_entity_id(source_id, entity.id)
+            if new_id in used_ids:
+                new_id = random_bytes[idx * 16 : (idx + 1) * 16].hex()
+            used_ids.add(new_id)
+            id_map[entity.id] = new_id
+            entity.id = new_id
+
+        # Triplets pointing at entities that were never extracted are dropped.
+        # Every field comes from an already validated triplet, so the new
+        # models skip validation.
+        new_triplets = [
+            Triplet.model_construct(
+                source_id=id_map[triplet.source_id],
+                relationship=triplet.relationship,
+                target_id=id_map[triplet.target_id],
             )
+            for triplet in triplets
+            if triplet.source_id in id_map and triplet.target_id in id_map
+        ]
 
         logging.debug(
-            f"Reassignment complete: {len(new_entities)} entities and {len(new_triplets)} triplets mapped"
+            "Reassignment complete: %s entities and %s triplets mapped",
+            len(entities),
+            len(new_triplets),
+        )
+        return entities, new_triplets
+
+    def _create_chunk_nodes(self, entities: list[Entity]):
+        doc_ids = list({doc_id for entity in entities for doc_id in entity.doc_ids})
+        logging.debug("Merging %s chunk nodes", len(doc_ids))
+        self.vector_store.query(
+            """
+            UNWIND $doc_ids AS doc_id
+            MERGE (c:Chunk {id: doc_id})
+            """,
+            params={"doc_ids": doc_ids},
         )
-        return new_entities, new_triplets
 
-    def _create_entity_and_links(self, entity: Entity, file_metadata: FileMetadata):
-        logging.debug(f"Creating entity node: {entity.id} ({entity.entity_label})")
-        create_entity_query = f"""
-        MERGE (e:{entity.entity_label} {{id: $entity_id, knowledge_base_id: $knowledge_base_id, source_id: $file_id}})
-        SET e += $properties
+    def _create_entities(
+        self, label: str, entities: list[Entity], file_metadata: FileMetadata
+    ):
+        logging.debug("Merging %s entity nodes (%s)", len(entities), label)
+        query = f"""
+        UNWIND $rows AS row
+        MERGE (e:{label}:Entity {{id: row.id, knowledge_base_id: $knowledge_base_id, source_id: $file_id}})
+        SET e += row.properties
+        WITH e, row
+        UNWIND row.doc_ids AS doc_id
+        MATCH (c:Chunk {{id: doc_id}})
+        MERGE (e)-[:BELONGS_TO]->(c)
         """
+        rows = [
+            {
+                "id": entity.id,
+                "properties": entity.properties or {},
+                "doc_ids": list(entity.doc_ids),
+            }
+            for entity in entities
+        ]
 
         try:
-            logging.debug(
-                f"Executing MERGE query for entity {entity.id} with properties: {entity.properties}"
-            )
             self.vector_store.query(
-                create_entity_query,
+                query,
                 params={
-                    "entity_id": entity.id,
+                    "rows": rows,
                     "knowledge_base_id": self.knowledge_base.id,
                     "file_id": file_metadata["id"],
-                    "properties": entity.properties or {},
                 },
             )
-            logging.debug(f"Entity node created successfully: {entity.id}")
         except Exception as e:
-            logging.error(f"Failed to create entity node: {entity.id}, error: {str(e)}")
-            logging.debug("Entity:", entity)
+            logging.error("Failed to create %s entity nodes, error: %s", label, e)
             raise e
 
-        create_doc_rel_query = f"""
-        MATCH (e:{entity.entity_label} {{id: $entity_id}})
-        MERGE (c:Chunk {{id: $doc_id}})
-        MERGE (e)-[:BELONGS_TO]->(c)
-        """
-
+    def _create_triplet_relationships(self, relationship: str, triplets: list[Triplet]):
         logging.debug(
-            f"Creating BELONGS_TO relationships for entity {entity.id} with {len(entity.doc_ids)} documents"
-        )
-        for doc_idx, doc_id in enumerate(entity.doc_ids):
-            logging.debug(
-                f"Creating BELONGS_TO relationship {doc_idx + 1}/{len(entity.doc_ids)}: {entity.id} -> {doc_id}"
-            )
-            self.vector_store.query(
-                create_doc_rel_query, params={"entity_id": entity.id, "doc_id": doc_id}
-            )
-
-    def _create_triplet_relationship(self, triplet: Triplet):
-        logging.debug(
-            f"Creating triplet relationship: {triplet.source_id} -[{triplet.relationship}]-> {triplet.target_id}"
+            "Merging %s triplet relationships (%s)", len(triplets), relationship
         )
         query = f"""
-        MATCH (s {{id: $source_id}})
-        MATCH (t {{id: $target_id}})
-        MERGE (s)-[r:{triplet.relationship}]->(t)
+        UNWIND $rows AS row
+        MATCH (s:Entity {{id: row.source_id}})
+        MATCH (t:Entity {{id: row.target_id}})
+        MERGE (s)-[r:{relationship}]->(t)
         """
+        rows = [
+            {"source_id": triplet.source_id, "target_id": triplet.target_id}
+            for triplet in triplets
+        ]
 
         try:
-            self.vector_store.query(
-                query,
-                params={"source_id": triplet.source_id, "target_id": triplet.target_id},
-            )
-            logging.debug(f"Triplet relationship created successfully")
+            self.vector_store.query(query, params={"rows": rows})
         except Exception as e:
-            logging.error(f"Failed to create triplet relationship: {str(e)}")
+            logging.error("Failed to create %s relationships: %s", relationship, e)
             raise e
 
-    def _extract_community_summaries(
+    async def _aextract_community_summaries(
         self,
         file_metadata: FileMetadata,
         node_labels: list[str],
         relationship_labels: list[str],
     ):
-        logging.debug(f"Starting community summary extraction")
+        logging.debug("Starting community summary extraction")
         logging.debug(
-            f"Creating community nodes with {len(node_labels)} node labels and {len(relationship_labels)} relationship labels"
+            "Creating community nodes with %s node labels and %s relationship labels",
+            len(node_labels),
+            len(relationship_labels),
         )
-        self._make_community_nodes(file_metadata, node_labels, relationship_labels)
-        logging.debug(f"Community nodes created, now generating summaries")
-        self._generate_community_summaries(file_metadata)
-        logging.debug(f"Community summary extraction complete")
+
+        # Files never run community detection concurrently, even across
+        # ingestors (see _COMMUNITY_LOCK)
+        def make_community_nodes():
+            with _COMMUNITY_LOCK:
+                self._make_community_nodes(
+                    file_metadata, node_labels, relationship_labels
+                )
+
+        await asyncio.to_thread(make_community_nodes)
+        logging.debug("Community nodes created, now generating summaries")
+        await self._agenerate_community_summaries(file_metadata)
+        logging.debug("Community summary extraction complete")
 
     def _make_community_nodes(
         self,
@@ -346,79 +1169,106 @@ class PropertyGraphIngestor(BaseIngestor):
         node_labels: list[str],
         relationship_labels: list[str],
     ):
-        logging.debug(f"Creating community nodes for file: {file_metadata['name']}")
+        logging.debug("Creating community nodes for file: %s", file_metadata["name"])
         logging.debug(
-            f"Building relationship projections from {len(relationship_labels)} labels"
+            "Building relationship projections from %s labels", len(relationship_labels)
         )
         relationship_projections = {
             relationship: {"orientation": "UNDIRECTED"}
             for relationship in relationship_labels
         }
         logging.debug(
-            f"Created {len(relationship_projections)} relationship projections"
+            "Created %s relationship projections", len(relationship_projections)
         )
 
         logging.debug("Projecting graph for community detection")
-        self.vector_store.query(
-            """//cypher
-            CALL gds.graph.project('kg', $node_labels, $relationship_projections)
-            YIELD graphName
-            CALL gds.leiden.write("kg", {writeProperty: "community_id"})
-            YIELD nodePropertiesWritten
-            RETURN nodePropertiesWritten
-            """,
-            params={
-                "node_labels": node_labels,
-                "relationship_projections": relationship_projections,
-            },
-        )
+        # Named per file so cleanup never drops another run's projection
+        graph_name = f"kg_{file_metadata['id']}"
+        try:
+            self.vector_store.query(
+                """//cypher
+                CALL gds.graph.project($graph_name, $node_labels, $relationship_projections)
+                YIELD graphName
+                CALL gds.leiden.write(graphName, {writeProperty: "community_id"})
+                YIELD nodePropertiesWritten
+                CALL gds.graph.drop(graphName, false)
+                YIELD graphName AS droppedGraphName
+                RETURN nodePropertiesWritten
+                """,
+                params={
+                    "graph_name": graph_name,
+                    "node_labels": node_labels,
+                    "relationship_projections": relationship_projections,
+                },
+            )
+        except Exception:
+            # Do not leave the projection behind
+            self.vector_store.query(
+                "CALL gds.graph.drop($graph_name, false) YIELD graphName",
+                params={"graph_name": graph_name},
+            )
+            raise
         logging.debug("Graph projection and community detection completed")
 
-        logging.debug("Dropping temporary graph projection")
-        self.vector_store.query("CALL gds.graph.drop('kg', false) YIELD graphName")
-        logging.debug("Graph projection dropped")
-
-        logging.debug("Updating community IDs to be globally unique")
+        logging.debug("Creating globally unique Community nodes")
         self.vector_store.query(
             """//cypher
-            MATCH (e {source_id: $source_id}) 
-            WHERE e.community_id IS NOT NULL 
+            MATCH (e:Entity {source_id: $source_id})
+            WHERE e.community_id IS NOT NULL
             SET e.community_id = toString(e.source_id) + "_" + toString(e.community_id)
-            """,
-            params={"source_id": file_metadata["id"]},
-        )
-        logging.debug("Community IDs updated")
-
-        logging.debug("Creating Community nodes and IN_COMMUNITY relationships")
-        self.vector_store.query(
-            """//cypher
-            MATCH (e {source_id: $source_id})
-            WHERE NOT e:Chunk AND e.community_id IS NOT NULL
-            WITH DISTINCT e.community_id AS id, collect(e) AS entities
+            WITH DISTINCT e.community_id AS id
             MERGE (c:Community {id: id})
             ON CREATE SET c.source_id = $source_id, c.knowledge_base_id = $knowledge_base_id
-            WITH c, entities
-            UNWIND entities AS e
-            MERGE (e)-[:IN_COMMUNITY]->(c)
-            RETURN c.id;
             """,
             params={
                 "source_id": file_metadata["id"],
                 "knowledge_base_id": self.knowledge_base.id,
-                "node_labels": node_labels,
             },
         )
+
+        # Link members in committed batches rather than one large transaction.
+        # Batches are not run in parallel: members of the same community would
+        # contend for the lock on the shared Community node.
+        logging.debug("Creating IN_COMMUNITY relationships")
+        result = self.vector_store.query(
+            """//cypher
+            CALL apoc.periodic.iterate(
+                "MATCH (e:Entity {source_id: $source_id})
+                WHERE e.community_id IS NOT NULL
+                RETURN e",
+                "MATCH (c:Community {id: e.community_id})
+                MERGE (e)-[:IN_COMMUNITY]->(c)",
+                {batchSize: 1000, parallel: false, params: {source_id: $source_id}}
+            )
+            YIELD batches, failedBatches, errorMessages
+            RETURN batches, failedBatches, errorMessages
+            """,
+            params={"source_id": file_metadata["id"]},
+        )
+        # periodic.iterate reports failed batches instead of raising; members
+        # left unlinked would get empty or partial community summaries
+        if result and result[0]["failedBatches"]:
+            logging.error(
+                "Failed to link %s/%s IN_COMMUNITY batches for file %s: %s",
+                result[0]["failedBatches"],
+                result[0]["batches"],
+                file_metadata["name"],
+                result[0]["errorMessages"],
+            )
+            raise RuntimeError(
+                f"IN_COMMUNITY linking failed: {result[0]['errorMessages']}"
+            )
         logging.debug("Community nodes and relationships created")
 
-    def _generate_community_summaries(self, file_metadata: FileMetadata):
+    async def _agenerate_community_summaries(self, file_metadata: FileMetadata):
         logging.debug(
-            f"Generating summaries for communities in file: {file_metadata['name']}"
+            "Generating summaries for communities in file: %s", file_metadata["name"]
         )
         logging.debug("Querying community data")
-        embedding = self.vector_store.embedding
-        raw_query_result: list[dict[str, str | list[dict]]] = self.vector_store.query(
+        raw_query_result: list[dict[str, str | list[dict]]] = await asyncio.to_thread(
+            self.vector_store.query,
             """//cypher
-            MATCH (e)-[:IN_COMMUNITY]->(c {source_id: $source_id})
+            MATCH (e)-[:IN_COMMUNITY]->(c:Community {source_id: $source_id})
             WITH c, collect(e) AS entities
 
             MATCH (src)-[r]->(tgt)
@@ -430,13 +1280,13 @@ class PropertyGraphIngestor(BaseIngestor):
             WITH c, 
                 collect({
                     source: {
-                        labels: labels(src),
-                        properties: apoc.map.clean(properties(src), ['community_id', 'source_id', 'id'], [])
+                        labels: [label IN labels(src) WHERE label <> 'Entity'],
+                        properties: apoc.map.clean(properties(src), ['community_id', 'source_id', 'id', 'embedding'], [])
                     },
                     relationship: type(r),
                     target: {
-                        labels: labels(tgt),
-                        properties: apoc.map.clean(properties(src), ['community_id', 'source_id', 'id'], [])
+                        labels: [label IN labels(tgt) WHERE label <> 'Entity'],
+                        properties: apoc.map.clean(properties(tgt), ['community_id', 'source_id', 'id', 'embedding'], [])
                     }
                 }) AS triplets
 
@@ -453,77 +1303,93 @@ class PropertyGraphIngestor(BaseIngestor):
             return
 
         community_data = raw_query_result[0].get("result")
-        logging.debug(f"Retrieved data for {len(community_data)} communities")
-        community_summaries: dict[str, dict] = {}
+        logging.debug("Retrieved data for %s communities", len(community_data))
+        saved = await self._asummarize_communities(community_data)
 
-        for idx, mapping in enumerate(community_data):
-            community_id = mapping["id"]
-            triplets = mapping["triplets"]
-            logging.debug(
-                f"Processing community {idx + 1}/{len(community_data)}: {community_id} with {len(triplets)} triplets"
-            )
+        if not saved:
+            logging.debug("No community summaries generated")
+            return
 
-            entities_str = json.dumps(triplets, indent=2)
+        logging.debug("Successfully saved %s community summaries to database", saved)
+
+    async def _asummarize_communities(self, community_data: list[dict]) -> int:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def summarize(mapping: dict) -> tuple[str, str] | None:
+            community_id = mapping["id"]
+            entities_str = _compact_triplets(mapping["triplets"])
             try:
-                logging.debug(f"Invoking LLM to summarize community {community_id}")
-                res = self.llm.invoke(
-                    [
-                        SystemMessage(content=self._community_summarization_sys_prompt),
-                        HumanMessage(
-                            content=(
-                                f"DATASET: The following triplets belong to a single community. "
-                                f"Analyze them and provide the summary:\n{entities_str}"
-                            )
-                        ),
-                    ]
+                logging.debug(
+                    "Invoking LLM to summarize community %s with %s triplets",
+                    community_id,
+                    len(mapping["triplets"]),
                 )
-                community_summaries[community_id] = {"summary": res.content}
+                async with semaphore:
+                    res = await self.llm.ainvoke(
+                        [
+                            self._community_summarization_sys_message,
+                            HumanMessage(
+                                content=(
+                                    f"DATASET: The following entities and relationships belong to a single community. "
+                                    f"Each relationship is [source entity index, relationship, target entity index]. "
+                                    f"Analyze them and provide the summary:\n{entities_str}"
+                                )
+                            ),
+                        ]
+                    )
                 logging.debug(
-                    f"Successfully generated summary for community {community_id}"
+                    "Successfully generated summary for community %s", community_id
                 )
+                return community_id, res.content
             except Exception as e:
-                logging.error(f"Failed to summarize community {community_id}: {e}")
+                logging.error("Failed to summarize community %s: %s", community_id, e)
+                return None
 
-        if not community_summaries:
-            logging.debug("No community summaries generated")
-            return
+        # Summaries are embedded and written every summary_batch_size
+        # communities so only one batch of vectors is held in memory
+        max_failures = self.max_summary_failure_ratio * len(community_data)
+        saved = 0
+        failed = 0
+        for batch in batched(community_data, self.summary_batch_size):
+            results = await asyncio.gather(*[summarize(mapping) for mapping in batch])
+            summaries = [result for result in results if result]
+            failed += len(batch) - len(summaries)
+            if failed > max_failures:
+                raise RuntimeError(
+                    f"Failed to summarize {failed} of {len(community_data)} communities"
+                )
+            if summaries:
+                saved += await asyncio.to_thread(
+                    self._save_community_summaries, summaries
+                )
+        if failed:
+            logging.warning(
+                "Failed to summarize %s of %s communities", failed, len(community_data)
+            )
+        return saved
 
-        logging.debug(
-            f"Generated {len(community_summaries)} community summaries, now generating embeddings"
-        )
+    def _save_community_summaries(self, summaries: list[tuple[str, str]]) -> int:
+        logging.debug("Embedding %s community summaries", len(summaries))
         # Generate vectors for community summaries (order-safe)
-        community_ids = list(community_summaries.keys())
-        summaries = [community_summaries[cid]["summary"] for cid in community_ids]
-        logging.debug(f"Embedding {len(summaries)} community summaries")
-        embeddings = embedding.embed_documents(summaries)
-        logging.debug(f"Generated {len(embeddings)} embeddings")
-        for idx, cid in enumerate(community_ids):
-            community_summaries[cid]["embedding"] = embeddings[idx]
-            logging.debug(
-                f"Assigned embedding {idx + 1}/{len(community_ids)} to community {cid}"
-            )
+        embeddings = self.vector_store.embedding.embed_documents(
+            [summary for _, summary in summaries]
+        )
+        logging.debug("Generated %s embeddings", len(embeddings))
 
-        if community_summaries:
-            logging.debug(
-                f"Saving {len(community_summaries)} community summaries and embeddings to database"
-            )
-            self.vector_store.query(
-                """
-                UNWIND $data AS row
-                MATCH (c:Community {id: row.cid})
-                SET c.summary = row.summary, c.embedding = row.embedding
-                """,
-                params={
-                    "data": [
-                        {
-                            "cid": cid,
-                            "summary": data["summary"],
-                            "embedding": data["embedding"],
-                        }
-                        for cid, data in community_summaries.items()
-                    ]
-                },
-            )
-            logging.debug(
-                f"Successfully saved {len(community_summaries)} community summaries to database"
-            )
+        logging.debug(
+            "Saving %s community summaries and embeddings to database", len(summaries)
+        )
+        self.vector_store.query(
+            """
+            UNWIND $data AS row
+            MATCH (c:Community {id: row.cid})
+            SET c.summary = row.summary, c.embedding = row.embedding
+            """,
+            params={
+                "data": [
+                    {"cid": cid, "summary": summary, "embedding": vector}
+                    for (cid, summary), vector in zip(summaries, embeddings)
+                ]
+            },
+        )
+        return len(summaries)
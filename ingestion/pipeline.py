@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from collections.abc import Iterable
 
 from common.schema.knowledge_base import KnowledgeBase
 from common.services.knowledge_base import KnowledgeBaseService
@@ -12,15 +14,43 @@ class Pipeline:
         knowledge_base: KnowledgeBase,
         knowledge_base_service: KnowledgeBaseService,
         ingestors: list[BaseIngestor],
+        max_workers: int = 4,
     ):
         self.knowledge_base = knowledge_base
         self.knowledge_base_service = knowledge_base_service
         self.ingestors = ingestors
+        # Files ingested concurrently; ingestors still run in order per file
+        self.max_workers = max_workers
 
-    def run(self, files: list[File]):
+    def run(self, files: Iterable[File]):
+        asyncio.run(self.arun(files))
+
+    async def arun(self, files: Iterable[File]):
         logging.info("Started Pipeline for Files")
-        self.knowledge_base_service.upsert(self.knowledge_base)
-        for file in files:
-            for ingestor in self.ingestors:
-                ingestor.ingest(self.knowledge_base, file.metadata, file.documents)
+        await asyncio.to_thread(self.knowledge_base_service.upsert, self.knowledge_base)
+        # All files share this one event loop, as the chat model's async HTTP
+        # client is bound to the loop it first ran on. files may be a
+        # generator; it is pulled from as files complete, so only max_workers
+        # files (plus the next one) are loaded at a time
+        files = iter(files)
+        in_flight: set[asyncio.Task] = set()
+        try:
+            while file := await asyncio.to_thread(next, files, None):
+                if len(in_flight) >= self.max_workers:
+                    done, in_flight = await asyncio.wait(
+                        in_flight, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    await asyncio.gather(*done)
+                in_flight.add(asyncio.create_task(self._aingest_file(file)))
+            await asyncio.gather(*in_flight)
+        finally:
+            # On failure the remaining files are cancelled, and waited for so
+            # none is left running past the pipeline
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
         logging.info("Pipeline Completed")
+
+    async def _aingest_file(self, file: File):
+        for ingestor in self.ingestors:
+            await ingestor.aingest(self.knowledge_base, file.metadata, file.documents)
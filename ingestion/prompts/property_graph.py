@@ -32,23 +32,31 @@ EXTRACTION_SYSTEM_PROMPT = PromptTemplate.from_template(
         - `entity_labels` : {{entity_labels}}
         - `relationship_rules`: {{relationship_rules}}
 
-            
-    ### Existing Entities
-    Below is a list of entities already identified in previous documents. 
-    If the current text refers to these entities (even by pronoun or partial name), 
-    REUSE their IDs instead of creating new ones.
-    {{existing_entities}}
-
     ### Extraction Rules
     1. Strict Adherence: Extract ONLY the entity types listed in entity_labels. If an entity does not fit a label, ignore it. Assign a unique uuid to the extracted Entities.
     2. Relationship Validation: Only extract triples (Source - Relationship -> Target) that are explicitly permitted by the relationship_rules.
-    3. Property Extraction: For each entity, capture relevant attributes from the text (e.g., "age", "location", "year") and place them inside the properties dictionary. If no properties are found, return an empty dictionary {}.
+    3. Property Extraction: For each entity, always include a "name" property holding the entity's full canonical name as a string, then capture other relevant attributes from the text (e.g., "age", "location", "year") inside the same properties dictionary.
     4. Resolution: If the text refers to an entity by a pronoun (e.g., "he", "him") resolve it to an entity from the 'Existing Entities' list or a new entity you've identified in this document. If an existing entity exists then extend the properties
     5. Triplet construction: Only make the triplets from the identified list of entities, only use the ids of entities which have already been identified.
     6. Output Format: Output must be a single, valid JSON object. No conversational filler.
-
+    {% if output_format %}
     ### Strict JSON Output Format
     {{output_format}}
+    {% endif %}
+    """,
+    template_format="jinja2",
+)
+
+# Kept separate from EXTRACTION_SYSTEM_PROMPT so the static ontology prefix is
+# identical across documents and can be served from the provider's prompt cache
+EXISTING_ENTITIES_PROMPT = PromptTemplate.from_template(
+    """
+    ### Existing Entities
+    Below is a list of entities already identified in previous documents. 
+    If the current text refers to these entities (even by pronoun or partial name), 
+    REUSE their IDs instead of creating new ones.
+    The list is given as parallel arrays: `ids[i]`, `labels[i]` and `names[i]` describe the same entity.
+    {{existing_entities}}
     """,
     template_format="jinja2",
 )
@@ -1,30 +1,88 @@
+import mmap
 import uuid
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from ingestion.readers.base import BaseReader
-from ingestion.schema.file import FileMetadata
+from ingestion.schema.file import File, FileMetadata
+
+# Bytes of the file decoded and handed to the splitter at a time
+_READ_BLOCK_SIZE = 1 << 20
+# Headings first so chunks start at sections, and sentence ends before single
+# spaces so long paragraphs are merged from sentences rather than words
+_SEPARATORS = [r"\n#{1,6} ", r"\n\n", r"\n", r"(?<=[.!?]) ", " ", ""]
 
 
 class MarkdownReader(BaseReader):
 
     def __init__(self, file_path: Path, chunk_size: int = 512, chunk_overlap: int = 32):
         super().__init__(file_path, chunk_size, chunk_overlap)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=_SEPARATORS,
+            is_separator_regex=True,
+        )
         self._read_file()
 
     def _read_file(self):
         self.file_name = self.file_path.name
         self.file_id = uuid.uuid4().hex
-        self.file_content = self.file_path.read_text()
+
+    @property
+    def file_content(self) -> str:
+        return self.file_path.read_text()
 
     def get_file_metadata(self) -> FileMetadata:
         return {"id": self.file_id, "name": self.file_name}
 
+    def _iter_blocks(self):
+        # Blocks end on paragraph breaks, which the splitter prefers to cut on
+        # anyway, so only chunks touching a block boundary can differ from
+        # splitting the whole file at once
+        with self.file_path.open("rb") as f:
+            if not f.seek(0, 2):
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = 0
+                while start < len(mm):
+                    end = start + _READ_BLOCK_SIZE
+                    if end < len(mm):
+                        cut = mm.rfind(b"\n\n", start, end)
+                        if cut <= start:
+                            cut = mm.find(b"\n\n", end)
+                        end = len(mm) if cut == -1 else cut + 2
+                    yield mm[start:end].decode()
+                    start = end
+
     def get_documents(self) -> list[Document]:
-        documents = self.text_splitter.create_documents(
-            [self.file_content], [{"source": self.file_name, "source_id": self.file_id}]
-        )
-        for document in documents:
-            document.id = uuid.uuid4().hex
+        metadata = {"source": self.file_name, "source_id": self.file_id}
+        documents = []
+        for block in self._iter_blocks():
+            documents.extend(self.text_splitter.create_documents([block], [metadata]))
+        # One random prefix per call and a counter keep ids 32 hex chars and
+        # unique without an entropy read per document
+        prefix = uuid.uuid4().hex[:24]
+        for idx, document in enumerate(documents):
+            document.id = f"{prefix}{idx:08x}"
         return documents
+
+
+def load_markdown_files(
+    file_paths: Iterable[Path], max_workers: int = 4
+) -> Iterator[File]:
+    # Reads up to max_workers files ahead of the consumer, in order, so a lazy
+    # consumer such as Pipeline.run still bounds how many files are in memory
+    pending: deque[Future[File]] = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for path in file_paths:
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+            pending.append(executor.submit(lambda p: MarkdownReader(p).load(), path))
+        while pending:
+            yield pending.popleft().result()
@@ -6,7 +6,10 @@ class Entity(BaseModel):
 
     id: str = Field(..., description="Unique uuid identifier for the Entity")
     entity_label: str = Field(..., description="Label of the entity")
-    properties: dict = Field(..., description="Properties belonging to the entity")
+    properties: dict = Field(
+        ...,
+        description="Properties belonging to the entity, including its canonical name under 'name'",
+    )
     doc_ids: set[str] = Field(default_factory=set, exclude=True)
 
 
@@ -21,3 +24,15 @@ class EntityRelationships(BaseModel):
     triplets: list[Triplet] = Field(
         ..., description="Tripltets of the identified entities"
     )
+
+
+class DocumentEntityRelationships(EntityRelationships):
+    doc_index: int = Field(
+        ..., description="doc_index of the input document these results belong to"
+    )
+
+
+class BatchEntityRelationships(BaseModel):
+    results: list[DocumentEntityRelationships] = Field(
+        ..., description="Extraction results, one per input document"
+    )
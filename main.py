@@ -5,15 +5,17 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 from langchain.messages import HumanMessage
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_neo4j.vectorstores.neo4j_vector import Neo4jVector
 from langchain_openai import ChatOpenAI
 
+from common.embedding import QueryCachedEmbeddings
+from common.llm import llm_client_config
 from ingestion.ingestors.lexical_graph import LexicalGraphIngestor
 from ingestion.ingestors.property_graph import PropertyGraphIngestor
 from ingestion.pipeline import Pipeline
-from ingestion.readers.markdown import MarkdownReader
+from ingestion.readers.markdown import load_markdown_files
 from rag.agent import create_rag_agent
+from rag.cyphers.chunk import expanded_chunk_retrieval
 from rag.retrievers import drift_search, vector_search
 from rag.schema.agent import RAGContext
 
@@ -45,7 +47,7 @@ def check_ingestion(
         Path(__file__).resolve().parent / "ingestion" / "data" / "ayrton_senna.md",
     ]
 
-    files = [MarkdownReader(path).load() for path in file_paths]
+    files = load_markdown_files(file_paths)
 
     lexical_graph_ingestor = LexicalGraphIngestor(
         vector_store=lexical_vector_store,
@@ -59,8 +61,10 @@ def check_ingestion(
 
     pipeline = Pipeline(ingestors=[lexical_graph_ingestor, property_graph_ingestor])
 
-    # property_graph_ingestor._generate_community_summaries(
-    #     file_metadata={"id": "88d4a7e879d54a619cc00ef64f96161f"}
+    # asyncio.run(
+    #     property_graph_ingestor._agenerate_community_summaries(
+    #         file_metadata={"id": "88d4a7e879d54a619cc00ef64f96161f"}
+    #     )
     # )
 
     pipeline.run(files)
@@ -96,13 +100,14 @@ def check_agent(query: str, llm: ChatOpenAI, vector_store: Neo4jVector):
 def main() -> None:
     setup_logger()
 
-    embedding = GoogleGenerativeAIEmbeddings(
+    embedding = QueryCachedEmbeddings(
         model="gemini-embedding-001", output_dimensionality=768
     )
     llm = ChatOpenAI(
         model="openai/gpt-oss-120b:free",
         base_url="https://openrouter.ai/api/v1",
         reasoning_effort="medium",
+        **llm_client_config(),
     )
 
     lexical_vector_store = Neo4jVector(
@@ -114,7 +119,7 @@ def main() -> None:
         embedding_node_property="embedding",
         index_name="vector_index",
         embedding_dimension=768,
-        retrieval_query="RETURN node.text AS text, score, node {.*, text: Null, embedding:Null} as metadata",
+        retrieval_query=expanded_chunk_retrieval,
     )
 
     property_vector_store = Neo4jVector(
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from langchain.agents import create_agent
 from langchain_core.language_models.chat_models import BaseChatModel
 from langgraph.checkpoint.base import BaseCheckpointSaver
@@ -8,15 +10,39 @@ from rag.tools.search import asearch_knowledge_base, asimilarity_search_tool
 from rag.types.agent import RAGAgent
 
 
-def create_rag_agent(
-    llm: BaseChatModel, checkpointer: BaseCheckpointSaver | None = None
-) -> RAGAgent:
+@lru_cache(maxsize=1)
+def _render_system() -> str:
+    return SYSTEM_PROMPT.invoke({}).to_string()
+
+
+class _Identity:
+    # Chat models and checkpointers are not hashable; compiled agents are keyed
+    # on the instances themselves, which the cache keeps alive
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __hash__(self) -> int:
+        return id(self.obj)
 
-    agent = create_agent(
-        model=llm,
-        system_prompt=SYSTEM_PROMPT.invoke({}).to_string(),
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _Identity) and other.obj is self.obj
+
+
+@lru_cache(maxsize=8)
+def _compile_agent(llm: _Identity, checkpointer: _Identity) -> RAGAgent:
+    return create_agent(
+        model=llm.obj,
+        system_prompt=_render_system(),
         tools=[asearch_knowledge_base, asimilarity_search_tool],
         context_schema=RAGContext,
-        checkpointer=checkpointer,
+        checkpointer=checkpointer.obj,
     )
-    return agent
+
+
+def create_rag_agent(
+    llm: BaseChatModel, checkpointer: BaseCheckpointSaver | None = None
+) -> RAGAgent:
+    # Compiling the graph is repeated work for the same model and checkpointer
+    return _compile_agent(_Identity(llm), _Identity(checkpointer))
@@ -1,11 +1,10 @@
-expand_chunk = """//cypher
-WITH $chunks AS chunk_ids
-MATCH (c:Chunk)
-WHERE c.id IN chunk_ids
-OPTIONAL MATCH (c)-[:SIMILAR]-(similar)
-WITH
-  collect({ text: c.text, source_id: c.source_id }) +
-  collect({ text: similar.text, source_id: similar.source_id }) AS all_chunks
-UNWIND all_chunks AS chunk
-RETURN collect(DISTINCT chunk) AS chunks
+expanded_chunk_retrieval = """//cypher
+// Retrieval query of the lexical vector store: every hit comes back with the
+// chunks SIMILAR to it, so one round-trip replaces search plus expansion.
+// Chunks reached from several hits are deduplicated by the caller
+WITH node, score
+OPTIONAL MATCH (node)-[:SIMILAR]-(similar:Chunk)
+WITH node, score, collect(DISTINCT similar) AS similar
+UNWIND [node] + similar AS chunk
+RETURN chunk.text AS text, score, chunk {.*, text: Null, embedding: Null} AS metadata
 """
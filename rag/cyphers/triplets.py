@@ -1,6 +1,6 @@
 get_triplets_by_community_id = """//cypher
-// Get triplets by community id
-WITH "f2c121e4969c439791f572ba029e8676_9" AS community_id
+// Get triplets by community id; parameterized so every community shares one plan
+WITH $community_id AS community_id
 
 // Get the community node
 MATCH (c:Community {id: community_id})<-[:IN_COMMUNITY]-(e)
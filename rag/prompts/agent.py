@@ -16,3 +16,10 @@ SYSTEM_PROMPT = PromptTemplate.from_template(
 """,
     template_format="jinja2",
 )
+
+INTENT_CLASSIFIER_PROMPT = PromptTemplate.from_template(
+    """
+Classify the user's message. It is **factual** if answering it needs specific facts, dates, statistics or details from a knowledge base. Greetings, thanks, small talk, restatements and creative or procedural requests are not factual. If unsure, classify it as factual.
+""",
+    template_format="jinja2",
+)
@@ -16,13 +16,10 @@ PRIMER_SEARCH_PROMPT = PromptTemplate.from_template(
     **Strict Constraints**
     1. **Context Only:** Use ONLY the provided context. Do not use outside knowledge, personal opinions, or assumptions.
     2. **Quantitative Requirement:** You must generate exactly **{{follow_up_count}}** relevant follow-up questions that help the user explore the provided context further.
-    3. **Field Placement:** You must place the main response to the user's query inside the **"body"** field of the JSON.
-    4. **Strict JSON:** Output must be a single, valid JSON object. Do not include introductory text, conversational fillers, or markdown code blocks (unless the user specifically requests markdown formatting inside the JSON string).
-    5. **No Commentary:** Do not provide any meta-talk or explanations about your thought process.
-    6. **Unanswerable Queries:** If the context does not contain the answer, set "answer" to "I'm sorry, but the provided documentation does not contain information to answer this question." and leave "follow_up_questions" as an empty list.
-    
-    **Output Schema**
-    {{output_instructions}}
+    3. **Field Placement:** You must place the main response to the user's query inside the **"body"** field.
+    4. **No Commentary:** Do not provide any meta-talk or explanations about your thought process.
+    5. **Unanswerable Queries:** If the context does not contain the answer, set "answer" to "I'm sorry, but the provided documentation does not contain information to answer this question." and leave "follow_up_questions" as an empty list.
+    6. **Completeness:** Set **"confidence"** between 0 and 1 to how completely the context answers the query, and set **"needs_more_info"** to false when the follow-up questions are not needed to answer it.
     """,
     template_format="jinja2",
 )
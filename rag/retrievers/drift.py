@@ -1,28 +1,109 @@
 import asyncio
+import logging
+from functools import lru_cache
 
 from langchain.messages import HumanMessage, SystemMessage
 from langchain_core.documents import Document
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.vectorstores import VectorStore
 
 from rag.prompts.retrievers import HYDE_SYSTEM_PROMPT, PRIMER_SEARCH_PROMPT
-from rag.retrievers.vector import avector_search, vector_search
-from rag.schema.retrievers import Answer, DriftConfig, Node
+from rag.retrievers.vector import (
+    avector_search,
+    avector_search_many,
+    vector_search,
+    vector_search_many,
+)
+from rag.schema.retrievers import Answer, BatchAnswer, DriftConfig, Node
+from rag.utils.query_cache import QueryCache
 
 __all__ = ["drift_search"]
 
-answer_parser = PydanticOutputParser(pydantic_object=Answer)
+context_cache = QueryCache(max_size=256, ttl_seconds=600)
+
+
+@lru_cache(maxsize=1)
+def _render_hyde() -> str:
+    return HYDE_SYSTEM_PROMPT.invoke({}).to_string()
+
+
+@lru_cache(maxsize=32)
+def _render_primer(follow_up_count: int) -> str:
+    return PRIMER_SEARCH_PROMPT.invoke({"follow_up_count": follow_up_count}).to_string()
+
+
+# Rendered at import so no request pays for the first render of the usual
+# follow-up counts
+_render_hyde()
+for _follow_up_count in range(1, 6):
+    _render_primer(_follow_up_count)
+
+
+def _structured(llm: BaseChatModel, schema: type[Answer] | type[BatchAnswer]):
+    # The provider enforces the schema through a tool call instead of format
+    # instructions in the prompt
+    return llm.with_structured_output(schema, method="function_calling")
+
+
+def _canonical_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+def _unseen(
+    queries: list[str], seen: set[str], max_nodes: int | None = None
+) -> list[str]:
+    # Follow-ups already asked anywhere in the tree are dropped: their answer
+    # is collected once and a second subtree would only repeat it. seen holds
+    # every query dispatched so far, so it also bounds the tree size
+    unique = []
+    for query in queries:
+        if max_nodes is not None and len(seen) >= max_nodes:
+            break
+        key = _canonical_query(query)
+        if key not in seen:
+            seen.add(key)
+            unique.append(query)
+    return unique
+
+
+def _follow_ups(answer: Answer, config: DriftConfig) -> list[str]:
+    # A confident or complete answer is not explored further
+    if (
+        answer.confidence >= config.get("min_confidence", 0.85)
+        or not answer.needs_more_info
+    ):
+        return []
+    return answer.follow_up_questions
+
+
+def _format_context(top_communities: list[Document]) -> str:
+    # Same communities, same bytes: ordered by id rather than by score so
+    # sibling queries share the cacheable prefix up to their question
+    communities = {
+        community.metadata.get("id") or community.page_content: community
+        for community in top_communities
+    }
+    keys = sorted(communities)
+    # Sibling nodes usually retrieve the same communities; the joined string is
+    # built once and shared instead of rebuilt per node
+    cache_key = "\x1f".join(keys)
+    context = context_cache.get(cache_key)
+    if context is None:
+        context = "Context:\n\n" + "\n\n---\n\n".join(
+            communities[key].page_content for key in keys
+        )
+        context_cache.put(cache_key, context)
+    return context
 
 
 def expand_query(query: str, llm: BaseChatModel) -> str:
-    system_prompt = HYDE_SYSTEM_PROMPT.invoke({}).to_string()
+    system_prompt = _render_hyde()
     res = llm.invoke([SystemMessage(system_prompt), HumanMessage(f"Question {query}")])
     return query + res.content
 
 
 async def aexpand_query(query: str, llm: BaseChatModel) -> str:
-    system_prompt = HYDE_SYSTEM_PROMPT.invoke({}).to_string()
+    system_prompt = _render_hyde()
     res = await llm.ainvoke(
         [SystemMessage(system_prompt), HumanMessage(f"Question {query}")]
     )
@@ -34,23 +115,15 @@ def primer_search(
     top_communities: list[Document],
     llm: BaseChatModel,
     max_follow_ups: int = 3,
-) -> tuple[str, list[str]]:
-    context = "Context:\n\n" + "\n\n---\n\n".join(
-        r.page_content for r in top_communities
-    )
-    system_prompt = PRIMER_SEARCH_PROMPT.invoke(
-        {
-            "follow_up_count": max_follow_ups,
-            "output_instructions": answer_parser.get_format_instructions(),
-        }
-    ).to_string()
-
-    res = llm.invoke(
+) -> Answer:
+    context = _format_context(top_communities)
+    system_prompt = _render_primer(max_follow_ups)
+
+    answer: Answer = _structured(llm, Answer).invoke(
         [SystemMessage(system_prompt), SystemMessage(context), HumanMessage(query)]
     )
-    answer: Answer = answer_parser.invoke(res)
 
-    return answer.body, answer.follow_up_questions
+    return answer
 
 
 async def aprimer_search(
@@ -58,22 +131,175 @@ async def aprimer_search(
     top_communities: list[Document],
     llm: BaseChatModel,
     max_follow_ups: int = 3,
-) -> tuple[str, list[str]]:
-    context = "Context:\n\n" + "\n\n---\n\n".join(
-        r.page_content for r in top_communities
-    )
-    system_prompt = PRIMER_SEARCH_PROMPT.invoke(
-        {
-            "follow_up_count": max_follow_ups,
-            "output_instructions": answer_parser.get_format_instructions(),
-        }
-    ).to_string()
-    res = await llm.ainvoke(
+) -> Answer:
+    context = _format_context(top_communities)
+    system_prompt = _render_primer(max_follow_ups)
+    answer: Answer = await _structured(llm, Answer).ainvoke(
         [SystemMessage(system_prompt), SystemMessage(context), HumanMessage(query)]
     )
-    answer: Answer = await answer_parser.ainvoke(res)
 
-    return answer.body, answer.follow_up_questions
+    return answer
+
+
+def _batch_primer_messages(
+    queries: list[str], top_communities: list[Document], max_follow_ups: int
+) -> list[SystemMessage | HumanMessage]:
+    context = _format_context(top_communities)
+    system_prompt = _render_primer(max_follow_ups)
+    questions = "\n".join(f"{idx}. {query}" for idx, query in enumerate(queries, 1))
+    return [
+        SystemMessage(system_prompt),
+        SystemMessage(context),
+        HumanMessage(
+            "Answer each of the following questions independently, with one "
+            f"answer per question in the same order:\n{questions}"
+        ),
+    ]
+
+
+def _unpack_batch_answer(queries: list[str], answer: BatchAnswer) -> list[Answer]:
+    if len(answer.answers) != len(queries):
+        logging.warning(
+            "Batched primer returned %s answers for %s questions",
+            len(answer.answers),
+            len(queries),
+        )
+    answers = answer.answers[: len(queries)]
+    # Questions left unanswered get an empty answer
+    answers += [
+        Answer(body="", follow_up_questions=[])
+        for _ in range(len(queries) - len(answers))
+    ]
+    return answers
+
+
+def batch_primer_search(
+    queries: list[str],
+    top_communities: list[Document],
+    llm: BaseChatModel,
+    max_follow_ups: int = 3,
+) -> list[Answer]:
+    answer: BatchAnswer = _structured(llm, BatchAnswer).invoke(
+        _batch_primer_messages(queries, top_communities, max_follow_ups)
+    )
+    return _unpack_batch_answer(queries, answer)
+
+
+async def abatch_primer_search(
+    queries: list[str],
+    top_communities: list[Document],
+    llm: BaseChatModel,
+    max_follow_ups: int = 3,
+) -> list[Answer]:
+    answer: BatchAnswer = await _structured(llm, BatchAnswer).ainvoke(
+        _batch_primer_messages(queries, top_communities, max_follow_ups)
+    )
+    return _unpack_batch_answer(queries, answer)
+
+
+def _retrieve_level(
+    queries: list[str],
+    llm: BaseChatModel,
+    vector_store: VectorStore,
+    config: DriftConfig,
+) -> list[list[Document]]:
+    # All queries of a tree level are embedded in one request
+    expanded_queries = [expand_query(query, llm) for query in queries]
+    return vector_search_many(
+        expanded_queries, vector_store, config["top_k"], config.get("filter")
+    )
+
+
+async def _aretrieve_level(
+    queries: list[str],
+    llm: BaseChatModel,
+    vector_store: VectorStore,
+    config: DriftConfig,
+) -> list[list[Document]]:
+    expanded_queries = await asyncio.gather(*(aexpand_query(q, llm) for q in queries))
+    return await avector_search_many(
+        expanded_queries, vector_store, config["top_k"], config.get("filter")
+    )
+
+
+def _drift_children(
+    queries: list[str],
+    llm: BaseChatModel,
+    vector_store: VectorStore,
+    config: DriftConfig,
+    depth: int,
+    seen: set[str],
+) -> list[Node]:
+    queries = _unseen(queries, seen, config.get("max_nodes"))
+    if not queries:
+        return []
+    # Communities retrieved by several siblings are deduplicated in the prompt
+    top_communities = [
+        community
+        for communities in _retrieve_level(queries, llm, vector_store, config)
+        for community in communities
+    ]
+    answers = batch_primer_search(
+        queries, top_communities, llm, config["max_follow_ups"]
+    )
+    children = [Node(query=q, answer=a.body) for q, a in zip(queries, answers)]
+    if depth < config.get("max_depth", 3):
+        for child, answer in zip(children, answers):
+            for grandchild in _drift_children(
+                _follow_ups(answer, config),
+                llm,
+                vector_store,
+                config,
+                depth + 1,
+                seen,
+            ):
+                child.add_child(grandchild)
+    return children
+
+
+async def _adrift_children(
+    queries: list[str],
+    llm: BaseChatModel,
+    vector_store: VectorStore,
+    config: DriftConfig,
+    depth: int,
+    seen: set[str],
+) -> list[Node]:
+    queries = _unseen(queries, seen, config.get("max_nodes"))
+    if not queries:
+        return []
+    # Communities retrieved by several siblings are deduplicated in the prompt
+    top_communities = [
+        community
+        for communities in await _aretrieve_level(queries, llm, vector_store, config)
+        for community in communities
+    ]
+    answers = await abatch_primer_search(
+        queries, top_communities, llm, config["max_follow_ups"]
+    )
+    children = [Node(query=q, answer=a.body) for q, a in zip(queries, answers)]
+    if depth < config.get("max_depth", 3):
+        grandchildren = await asyncio.gather(
+            *(
+                _adrift_children(
+                    _follow_ups(answer, config),
+                    llm,
+                    vector_store,
+                    config,
+                    depth + 1,
+                    seen,
+                )
+                for answer in answers
+            ),
+            return_exceptions=True,
+        )
+        for child, nodes in zip(children, grandchildren):
+            if isinstance(nodes, BaseException):
+                logging.warning("DRIFT follow-ups of %r failed: %s", child.query, nodes)
+                continue
+            for node in nodes:
+                child.add_child(node)
+    return children
 
 
 def drift_search(
@@ -82,23 +308,41 @@ def drift_search(
     vector_store: VectorStore,
     config: DriftConfig,
     depth: int = 1,
+    top_communities: list[Document] | None = None,
+    seen: set[str] | None = None,
 ):
-    # Step 1: Prepare initial query representation
-    expanded_query = expand_query(query, llm)
+    if seen is None:
+        seen = {_canonical_query(query)}
+    # Follow-ups arrive with communities their parent retrieved for the level
+    if top_communities is None:
+        # Step 1: Prepare initial query representation
+        expanded_query = expand_query(query, llm)
 
-    # Step 2: Primer — global search for high-level context
-    top_communities = vector_search(expanded_query, vector_store, config["top_k"])
-    initial_answer, follow_up_questions = primer_search(
-        query, top_communities, llm, config["max_follow_ups"]
-    )
+        # Step 2: Primer — global search for high-level context
+        top_communities = vector_search(
+            expanded_query, vector_store, config["top_k"], config.get("filter")
+        )
+    answer = primer_search(query, top_communities, llm, config["max_follow_ups"])
 
-    node = Node(query=query, answer=initial_answer)
+    node = Node(query=query, answer=answer.body)
+    follow_up_questions = _follow_ups(answer, config)
 
-    if depth >= config.get("max_depth", 3):
+    if depth >= config.get("max_depth", 3) or not follow_up_questions:
         return node
 
-    for follow_up in follow_up_questions:
-        child = drift_search(follow_up, llm, vector_store, config, depth + 1)
+    if config.get("batch_follow_ups"):
+        for child in _drift_children(
+            follow_up_questions, llm, vector_store, config, depth + 1, seen
+        ):
+            node.add_child(child)
+        return node
+
+    follow_up_questions = _unseen(follow_up_questions, seen, config.get("max_nodes"))
+    retrieved = _retrieve_level(follow_up_questions, llm, vector_store, config)
+    for follow_up, communities in zip(follow_up_questions, retrieved):
+        child = drift_search(
+            follow_up, llm, vector_store, config, depth + 1, communities, seen
+        )
         node.add_child(child)
 
     return node
@@ -110,32 +354,75 @@ async def adrift_search(
     vector_store: VectorStore,
     config: DriftConfig,
     depth: int = 1,
+    top_communities: list[Document] | None = None,
+    seen: set[str] | None = None,
 ):
-    # Step 1: Prepare initial query representation
-    expanded_query = await aexpand_query(query, llm)
+    if seen is None:
+        seen = {_canonical_query(query)}
+    # Follow-ups arrive with communities their parent retrieved for the level
+    if top_communities is None:
+        # Step 1: Prepare initial query representation
+        expanded_query = await aexpand_query(query, llm)
 
-    # Step 2: Primer — global search for high-level context
-    top_communities = await avector_search(
-        expanded_query, vector_store, config["top_k"]
-    )
-    initial_answer, follow_up_questions = await aprimer_search(
-        query, top_communities, llm, config["max_follow_ups"]
-    )
+        # Step 2: Primer — global search for high-level context
+        top_communities = await avector_search(
+            expanded_query, vector_store, config["top_k"], config.get("filter")
+        )
+    answer = await aprimer_search(query, top_communities, llm, config["max_follow_ups"])
 
-    node = Node(query=query, answer=initial_answer)
+    node = Node(query=query, answer=answer.body)
+    follow_up_questions = _follow_ups(answer, config)
 
-    if depth >= config.get("max_depth", 3):
+    if depth >= config.get("max_depth", 3) or not follow_up_questions:
+        return node
+
+    if config.get("batch_follow_ups"):
+        try:
+            children = await _adrift_children(
+                follow_up_questions, llm, vector_store, config, depth + 1, seen
+            )
+        except Exception as e:
+            logging.warning("DRIFT follow-ups of %r failed: %s", query, e)
+            children = []
+        for child in children:
+            node.add_child(child)
+        return node
+
+    follow_up_questions = _unseen(follow_up_questions, seen, config.get("max_nodes"))
+    expanded = await asyncio.gather(
+        *(aexpand_query(q, llm) for q in follow_up_questions), return_exceptions=True
+    )
+    follow_ups, expanded_queries = [], []
+    for follow_up, expanded_query in zip(follow_up_questions, expanded):
+        if isinstance(expanded_query, BaseException):
+            logging.warning("DRIFT follow-up %r failed: %s", follow_up, expanded_query)
+            continue
+        follow_ups.append(follow_up)
+        expanded_queries.append(expanded_query)
+    # The whole level is embedded in one request
+    try:
+        retrieved = await avector_search_many(
+            expanded_queries, vector_store, config["top_k"], config.get("filter")
+        )
+    except Exception as e:
+        logging.warning("DRIFT follow-ups of %r failed: %s", query, e)
         return node
 
     # Build coroutines
     coroutines = [
-        adrift_search(follow_up, llm, vector_store, config, depth + 1)
-        for follow_up in follow_up_questions
+        adrift_search(
+            follow_up, llm, vector_store, config, depth + 1, communities, seen
+        )
+        for follow_up, communities in zip(follow_ups, retrieved)
     ]
-    # Run coroutines in parallel
-    children = await asyncio.gather(*coroutines)
+    # Run coroutines in parallel; a failed branch is dropped instead of
+    # discarding the answers of its siblings
+    children = await asyncio.gather(*coroutines, return_exceptions=True)
 
-    for child in children:
+    for follow_up, child in zip(follow_ups, children):
+        if isinstance(child, BaseException):
+            logging.warning("DRIFT follow-up %r failed: %s", follow_up, child)
+            continue
         node.add_child(child)
 
     return node
@@ -1,19 +1,31 @@
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
-from rag.cyphers.chunk import expand_chunk
 
 
-def similarity_search(query: str, vector_store: VectorStore, top_k: int = 5):
-    initial_documents = vector_store.similarity_search(query, top_k)
-    doc_ids = [chunk.id for chunk in initial_documents]
-    query = vector_store.query(expand_chunk, params={"chunks": doc_ids})
-    docs: dict = query[0].get("chunks")
-    return docs
+def _unique_chunks(documents: list[Document]) -> list[dict]:
+    # The store's retrieval query already expanded each hit to its SIMILAR
+    # chunks (rag.cyphers.chunk.expanded_chunk_retrieval)
+    chunks: dict[str, dict] = {}
+    for document in documents:
+        chunks.setdefault(
+            document.metadata.get("id") or document.page_content,
+            {
+                "text": document.page_content,
+                "source_id": document.metadata.get("source_id"),
+            },
+        )
+    return list(chunks.values())
 
 
-async def asimilarity_search(query: str, vector_store: VectorStore, top_k: int = 5):
-    initial_documents = await vector_store.asimilarity_search(query, top_k)
-    doc_ids = [chunk.id for chunk in initial_documents]
-    query = vector_store.query(expand_chunk, params={"chunks": doc_ids})
-    docs: dict = query[0].get("chunks")
-    return docs
+def similarity_search(
+    query: str, vector_store: VectorStore, top_k: int = 5, filter: dict | None = None
+):
+    documents = vector_store.similarity_search(query, top_k, filter=filter)
+    return _unique_chunks(documents)
+
+
+async def asimilarity_search(
+    query: str, vector_store: VectorStore, top_k: int = 5, filter: dict | None = None
+):
+    documents = await vector_store.asimilarity_search(query, top_k, filter=filter)
+    return _unique_chunks(documents)
@@ -1,18 +1,93 @@
+import asyncio
+
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStore
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+__all__ = ["vector_search", "vector_search_many"]
+
+# Texts per embedding request when a level of queries is embedded at once
+_EMBED_BATCH_SIZE = 32
+
+
+def _query_task_type(embedding: GoogleGenerativeAIEmbeddings) -> str:
+    # embed_documents defaults to RETRIEVAL_DOCUMENT; batched queries must keep
+    # the task type embed_query would have used
+    return embedding.task_type or "RETRIEVAL_QUERY"
+
 
-__all__ = ["vector_search"]
+def _embed_queries(embedding: Embeddings, queries: list[str]) -> list[list[float]]:
+    if isinstance(embedding, GoogleGenerativeAIEmbeddings):
+        return embedding.embed_documents(
+            queries,
+            batch_size=_EMBED_BATCH_SIZE,
+            task_type=_query_task_type(embedding),
+        )
+    return [embedding.embed_query(query) for query in queries]
+
+
+async def _aembed_queries(
+    embedding: Embeddings, queries: list[str]
+) -> list[list[float]]:
+    if isinstance(embedding, GoogleGenerativeAIEmbeddings):
+        task_type = _query_task_type(embedding)
+        # aembed_documents sends its own batches one after another
+        batches = await asyncio.gather(
+            *(
+                embedding.aembed_documents(
+                    queries[i : i + _EMBED_BATCH_SIZE], task_type=task_type
+                )
+                for i in range(0, len(queries), _EMBED_BATCH_SIZE)
+            )
+        )
+        return [vector for batch in batches for vector in batch]
+    return list(await asyncio.gather(*(embedding.aembed_query(q) for q in queries)))
 
 
 def vector_search(
-    query: str, vector_store: VectorStore, top_k: int = 5
+    query: str, vector_store: VectorStore, top_k: int = 5, filter: dict | None = None
 ) -> list[Document]:
-    documents = vector_store.similarity_search(query, top_k)
+    documents = vector_store.similarity_search(query, top_k, filter=filter)
     return documents
 
 
 async def avector_search(
-    query: str, vector_store: VectorStore, top_k: int = 5
+    query: str, vector_store: VectorStore, top_k: int = 5, filter: dict | None = None
 ) -> list[Document]:
-    documents = await vector_store.asimilarity_search(query, top_k)
+    documents = await vector_store.asimilarity_search(query, top_k, filter=filter)
     return documents
+
+
+def vector_search_many(
+    queries: list[str],
+    vector_store: VectorStore,
+    top_k: int = 5,
+    filter: dict | None = None,
+) -> list[list[Document]]:
+    if not queries:
+        return []
+    vectors = _embed_queries(vector_store.embeddings, queries)
+    return [
+        vector_store.similarity_search_by_vector(vector, top_k, filter=filter)
+        for vector in vectors
+    ]
+
+
+async def avector_search_many(
+    queries: list[str],
+    vector_store: VectorStore,
+    top_k: int = 5,
+    filter: dict | None = None,
+) -> list[list[Document]]:
+    if not queries:
+        return []
+    vectors = await _aembed_queries(vector_store.embeddings, queries)
+    return list(
+        await asyncio.gather(
+            *(
+                vector_store.asimilarity_search_by_vector(vector, top_k, filter=filter)
+                for vector in vectors
+            )
+        )
+    )
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 
+from pydantic import BaseModel, Field
+
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_neo4j.vectorstores.neo4j_vector import Neo4jVector
 
@@ -12,3 +14,14 @@ class RAGContext:
     llm: BaseChatModel
     lexical_vector_store: Neo4jVector | None = None
     commuunity_vector_store: Neo4jVector | None = None
+    # Restricts retrieval to one knowledge base when set
+    knowledge_base_id: str | None = None
+    # Cheap model asked whether a query needs retrieval before running DRIFT;
+    # every query is searched when unset
+    intent_llm: BaseChatModel | None = None
+
+
+class Intent(BaseModel):
+    factual: bool = Field(
+        description="Whether answering the message requires facts from the knowledge base"
+    )
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class Answer(BaseModel):
@@ -12,12 +12,38 @@ class Answer(BaseModel):
     follow_up_questions: list[str] = Field(
         description="Follow up questions based on context"
     )
+    # Defaults keep exploring when the model leaves these out
+    confidence: float = Field(
+        default=0.0,
+        ge=0,
+        le=1,
+        description="How completely the context answers the query, from 0 to 1",
+    )
+    needs_more_info: bool = Field(
+        default=True,
+        description="Whether follow-up questions are needed to answer the query",
+    )
+
+
+class BatchAnswer(BaseModel):
+    answers: list[Answer] = Field(
+        description="One answer per question, in the order the questions were asked"
+    )
 
 
 class DriftConfig(TypedDict):
     top_k: int = 5
     max_depth: int = 2
     max_follow_ups: int = 3
+    # Answer the follow-ups of a node in one LLM call over their shared context
+    batch_follow_ups: NotRequired[bool]
+    # Follow-ups are not explored once an answer is at least this confident
+    min_confidence: NotRequired[float]
+    # Upper bound on the number of nodes in the tree, root included
+    max_nodes: NotRequired[int]
+    # Metadata filter applied by the vector search itself, e.g. to one
+    # knowledge base: {"knowledge_base_id": ...}
+    filter: NotRequired[dict]
 
 
 class Node(BaseModel):
@@ -25,6 +51,8 @@ class Node(BaseModel):
     answer: str
     # Use a default_factory via Field to ensure each instance gets a fresh list
     children: list[Node] = Field(default_factory=list)
+    # Set by format_facts on the root of a finished tree
+    _formatted_facts: str | None = PrivateAttr(default=None)
 
     def add_child(self, node: Node):
         self.children.append(node)
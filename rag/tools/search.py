@@ -1,21 +1,80 @@
+import logging
+from functools import lru_cache
+
+from langchain.messages import HumanMessage, SystemMessage
 from langchain.tools import ToolRuntime, tool
 
+from rag.prompts.agent import INTENT_CLASSIFIER_PROMPT
 from rag.retrievers.drift import adrift_search, drift_search
 from rag.retrievers.similarity import asimilarity_search, similarity_search
-from rag.schema.agent import RAGContext
-from rag.utils.retrievers import collect_answers
+from rag.schema.agent import Intent, RAGContext
+from rag.schema.retrievers import DriftConfig
+from rag.utils.query_cache import QueryCache
+from rag.utils.retrievers import format_facts
+
+# DRIFT trees shared across sessions; siblings and repeat questions often
+# re-ask the same thing. Trees are stored as-is and never modified once built,
+# so the facts formatted on them are reused by every hit
+drift_cache = QueryCache()
+
+NO_RETRIEVAL_NEEDED = "No retrieval needed for this message."
+
+
+@lru_cache(maxsize=1)
+def _intent_system_message() -> SystemMessage:
+    return SystemMessage(INTENT_CLASSIFIER_PROMPT.invoke({}).to_string())
+
 
+def _needs_retrieval(query: str, ctx: RAGContext) -> bool:
+    if ctx.intent_llm is None:
+        return True
+    try:
+        intent: Intent = ctx.intent_llm.with_structured_output(Intent).invoke(
+            [_intent_system_message(), HumanMessage(query)]
+        )
+    except Exception as e:
+        # Unsure means factual
+        logging.warning("Intent classification of %r failed: %s", query, e)
+        return True
+    return intent.factual
 
-def _format_facts(facts: list[str]) -> str:
-    formatted = [f"- {fact}" for fact in facts if fact.strip()]
-    if formatted:
-        return "### Relevant Facts\n" + "\n".join(formatted)
-    return "No relevant facts found."
+
+async def _aneeds_retrieval(query: str, ctx: RAGContext) -> bool:
+    if ctx.intent_llm is None:
+        return True
+    try:
+        intent: Intent = await ctx.intent_llm.with_structured_output(Intent).ainvoke(
+            [_intent_system_message(), HumanMessage(query)]
+        )
+    except Exception as e:
+        logging.warning("Intent classification of %r failed: %s", query, e)
+        return True
+    return intent.factual
+
+
+def _search_filter(ctx: RAGContext) -> dict | None:
+    if ctx.knowledge_base_id:
+        return {"knowledge_base_id": ctx.knowledge_base_id}
+    return None
 
 
 def _get_drift_config(runtime: ToolRuntime[RAGContext]):
     ctx = runtime.context
-    return ctx.drift_config, ctx.llm, ctx.commuunity_vector_store
+    drift_config = ctx.drift_config
+    search_filter = _search_filter(ctx)
+    if search_filter:
+        drift_config = {**drift_config, "filter": search_filter}
+    return drift_config, ctx.llm, ctx.commuunity_vector_store
+
+
+def _drift_cache_key(query: str, llm, vector_store, drift_config: DriftConfig) -> str:
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", "")
+    return QueryCache.make_key(
+        query,
+        str(model),
+        getattr(vector_store, "index_name", ""),
+        sorted(drift_config.items()),
+    )
 
 
 @tool(
@@ -24,9 +83,14 @@ def _get_drift_config(runtime: ToolRuntime[RAGContext]):
 )
 def search_knowledge_base(query: str, runtime: ToolRuntime[RAGContext]) -> str:
     drift_config, llm, vector_store = _get_drift_config(runtime)
-    root = drift_search(query, llm, vector_store, drift_config)
-    facts = collect_answers(root)
-    return _format_facts(facts)
+    cache_key = _drift_cache_key(query, llm, vector_store, drift_config)
+    root = drift_cache.get(cache_key)
+    if root is None:
+        if not _needs_retrieval(query, runtime.context):
+            return NO_RETRIEVAL_NEEDED
+        root = drift_search(query, llm, vector_store, drift_config)
+        drift_cache.put(cache_key, root)
+    return format_facts(root)
 
 
 @tool(
@@ -35,9 +99,14 @@ def search_knowledge_base(query: str, runtime: ToolRuntime[RAGContext]) -> str:
 )
 async def asearch_knowledge_base(query: str, runtime: ToolRuntime[RAGContext]) -> str:
     drift_config, llm, vector_store = _get_drift_config(runtime)
-    root = await adrift_search(query, llm, vector_store, drift_config)
-    facts = collect_answers(root)
-    return _format_facts(facts)
+    cache_key = _drift_cache_key(query, llm, vector_store, drift_config)
+    root = drift_cache.get(cache_key)
+    if root is None:
+        if not await _aneeds_retrieval(query, runtime.context):
+            return NO_RETRIEVAL_NEEDED
+        root = await adrift_search(query, llm, vector_store, drift_config)
+        drift_cache.put(cache_key, root)
+    return format_facts(root)
 
 
 @tool(
@@ -46,7 +115,9 @@ async def asearch_knowledge_base(query: str, runtime: ToolRuntime[RAGContext]) -
 )
 def similarity_search_tool(query: str, runtime: ToolRuntime[RAGContext]):
     vector_store = runtime.context.lexical_vector_store
-    return similarity_search(query, vector_store)
+    return similarity_search(
+        query, vector_store, filter=_search_filter(runtime.context)
+    )
 
 
 @tool(
@@ -55,4 +126,6 @@ def similarity_search_tool(query: str, runtime: ToolRuntime[RAGContext]):
 )
 async def asimilarity_search_tool(query: str, runtime: ToolRuntime[RAGContext]):
     vector_store = runtime.context.lexical_vector_store
-    return asimilarity_search(query, vector_store)
+    return await asimilarity_search(
+        query, vector_store, filter=_search_filter(runtime.context)
+    )
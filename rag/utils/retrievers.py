@@ -3,8 +3,24 @@ from rag.schema.retrievers import Node
 
 def collect_answers(node: Node):
     answers: list[str] = []
-    if node.answer:
-        answers.append(node.answer)
-    for child in node.children:
-        answers.extend(collect_answers(child))
+    # Iterative pre-order walk: each answer still comes before its children's
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.answer:
+            answers.append(current.answer)
+        stack.extend(reversed(current.children))
     return answers
+
+
+def format_facts(node: Node) -> str:
+    # Cached trees are formatted again on every repeated question, so the
+    # text is kept on the node
+    if node._formatted_facts is None:
+        formatted = [f"- {fact}" for fact in collect_answers(node) if fact.strip()]
+        node._formatted_facts = (
+            "### Relevant Facts\n" + "\n".join(formatted)
+            if formatted
+            else "No relevant facts found."
+        )
+    return node._formatted_facts